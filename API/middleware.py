@@ -0,0 +1,233 @@
+import contextvars
+import ipaddress
+import json
+import logging
+import os
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+from http import HTTPStatus
+from time import time, perf_counter
+
+
+# Stage timings of the current request, only set when the client asked for them with the trace header.
+# Endpoints add their stages to the dict, which is shared with threadpool workers through the copied context.
+request_timings = contextvars.ContextVar("request_timings", default=None)
+
+def format_server_timing(timings: dict) -> str:
+    """Renders stage durations as a Server-Timing header value, in milliseconds"""
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings.items())
+
+
+class IPBlacklist:
+    """Set of blocked addresses and networks.
+
+    Single addresses are kept in a set. CIDR networks are indexed by prefix length, so a lookup
+    costs one set membership test per distinct prefix length instead of a scan over every network.
+    """
+
+    def __init__(self, entries: list = ()):
+        self.update(entries)
+
+    def update(self, entries: list):
+        """Replaces the blacklist with the given addresses and CIDR networks"""
+        addresses = set()
+        networks = {4: {}, 6: {}}
+        for entry in entries:
+            network = ipaddress.ip_network(entry, strict=False)
+            if network.prefixlen == network.max_prefixlen:
+                addresses.add(network.network_address)
+            else:
+                shift = network.max_prefixlen - network.prefixlen
+                networks[network.version].setdefault(shift, set()).add(int(network.network_address) >> shift)
+        self.addresses, self.networks = addresses, networks
+
+    def __contains__(self, client_ip: str) -> bool:
+        try:
+            address = ipaddress.ip_address(client_ip)
+        except ValueError:
+            return False
+        if address in self.addresses:
+            return True
+        value = int(address)
+        return any(value >> shift in prefixes for shift, prefixes in self.networks[address.version].items())
+
+
+class RateLimiter:
+    """Sliding window rate limiter keeping one deque of request timestamps per client"""
+
+    def __init__(self, max_requests: int = 5, window: float = 60):
+        self.max_requests = max_requests
+        self.window = window
+        self.requests = {}
+
+    def is_rate_limited(self, client_ip: str) -> bool:
+        now = time()
+        request_times = self.requests.setdefault(client_ip, deque())
+        # Remove timestamps outside the time window
+        while request_times and now - request_times[0] >= self.window:
+            request_times.popleft()
+
+        # Check if requests exceed the rate limit
+        if len(request_times) >= self.max_requests:
+            return True
+
+        # Log the current request time
+        request_times.append(now)
+        return False
+
+
+class JsonLogWriter:
+    """Appends request logs to a JSON array file from a background thread.
+
+    Callers only put entries on a queue. The writer thread drains it in batches and appends
+    them in place before the closing bracket, instead of rewriting the whole file per request.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="json-log-writer", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Flushes pending entries and stops the writer thread"""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def write(self, entry: dict):
+        self.queue.put(entry)
+
+    def _run(self):
+        while True:
+            entries = [self.queue.get()]
+            while True:
+                try:
+                    entries.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in entries
+            entries = [entry for entry in entries if entry is not None]
+            if entries:
+                try:
+                    self._append(entries)
+                except Exception as e:
+                    logging.getLogger(__name__).error(f"Error writing JSON logs: {e}")
+            if stop:
+                return
+
+    def _append(self, entries: list):
+        body = ",\n".join(json.dumps(entry) for entry in entries)
+        if os.path.exists(self.path):
+            with open(self.path, "rb+") as f:
+                end, last = self._last_non_space(f, f.seek(0, os.SEEK_END))
+                if last == b"]":
+                    # An empty array gets its first entries without a leading comma
+                    _, previous = self._last_non_space(f, end)
+                    separator = "" if previous == b"[" else ","
+                    f.seek(end)
+                    f.truncate()
+                    f.write(f"{separator}\n{body}\n]".encode())
+                    return
+                if last is not None:
+                    # Never overwrite a file that is not a JSON array, its entries would be lost
+                    raise ValueError(f"{self.path} does not end with ']', new entries were not written")
+        with open(self.path, "w") as f:
+            f.write(f"[\n{body}\n]")
+
+    @staticmethod
+    def _last_non_space(f, end: int, block_size: int = 4096) -> (int, bytes):
+        """Returns the position and value of the last non-whitespace byte before end, (0, None) if there is none"""
+        while end > 0:
+            start = max(0, end - block_size)
+            f.seek(start)
+            stripped = f.read(end - start).rstrip()
+            if stripped:
+                return start + len(stripped) - 1, stripped[-1:]
+            end = start
+        return 0, None
+
+
+class RequestPipelineMiddleware:
+    """Pure ASGI middleware doing IP blacklisting, rate limiting and request logging in one pass.
+
+    Nothing here blocks the event loop: checks are in-memory and log records are handed to
+    background writers. Requests carrying the trace header get their stage timings back in a
+    Server-Timing response header, other requests only pay for the header lookup.
+    """
+
+    def __init__(self, app, blacklist: IPBlacklist, rate_limiter: RateLimiter, json_log_writer: JsonLogWriter,
+                 logger: logging.Logger, rate_limited_paths: tuple = ("/predict",), trace_header: bytes = b"x-trace"):
+        self.app = app
+        self.blacklist = blacklist
+        self.rate_limiter = rate_limiter
+        self.json_log_writer = json_log_writer
+        self.logger = logger
+        self.rate_limited_paths = rate_limited_paths
+        self.trace_header = trace_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        start_time = datetime.now()
+        client_ip = scope["client"][0] if scope.get("client") else ""
+        path, method = scope["path"], scope["method"]
+        self.logger.info(f"Incoming request: {method} {path}")
+
+        status = {"code": 500}
+        timings = {} if any(name == self.trace_header for name, _ in scope["headers"]) else None
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if timings is not None:
+                    timings["total"] = perf_counter() - start
+                    headers = list(message.get("headers", [])) + [(b"server-timing", format_server_timing(timings).encode())]
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        token = request_timings.set(timings)
+        try:
+            checks_start = perf_counter()
+            if client_ip in self.blacklist:
+                await self._reject(send_wrapper, 403, "Access forbidden: IP blacklisted")
+            elif path in self.rate_limited_paths and self.rate_limiter.is_rate_limited(client_ip):
+                await self._reject(send_wrapper, 429, "Rate limit exceeded: Please wait before trying again.")
+            else:
+                if timings is not None:
+                    timings["checks"] = perf_counter() - checks_start
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            request_timings.reset(token)
+            self._log(start, start_time, path, method, status["code"])
+
+    @staticmethod
+    async def _reject(send, status_code: int, detail: str):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def _log(self, start: float, start_time: datetime, path: str, method: str, status_code: int):
+        self.json_log_writer.write({
+            "timestamp": start_time.isoformat(),
+            "endpoint": path,
+            "method": method,
+            "status_code": status_code,
+            "duration": perf_counter() - start,
+            "error": None if status_code == 200 else HTTPStatus(status_code).phrase
+        })
+        self.logger.info(f"Response status: {status_code}")
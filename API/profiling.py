@@ -0,0 +1,62 @@
+import os
+import sys
+import threading
+from collections import Counter
+from time import perf_counter, sleep
+
+
+class SamplingProfiler:
+    """Statistical profiler sampling the stacks of every thread of the running worker.
+
+    Unlike cProfile, which only traces the thread it is enabled in, this sees the threadpool threads
+    serving sync endpoints and the shadow executor. Nothing is hooked into the interpreter, so requests
+    pay no tracing cost: the sampler thread only takes the GIL briefly to copy the stacks every interval.
+    Results are in the collapsed-stack format read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, max_seconds: float = 60):
+        self.max_seconds = max_seconds
+        self.lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self.lock.locked()
+
+    def profile(self, seconds: float, interval: float = 0.005) -> dict:
+        """Samples all threads for the given time and returns the collapsed stacks with their counts.
+        Only one profile runs at a time, a RuntimeError is raised if another is in progress."""
+        if not self.lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            seconds = min(seconds, self.max_seconds)
+            stacks = Counter()
+            samples = 0
+            own_thread = threading.get_ident()
+            deadline = perf_counter() + seconds
+            while perf_counter() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id != own_thread:
+                        stacks[self._collapse(names.get(thread_id, str(thread_id)), frame)] += 1
+                samples += 1
+                sleep(interval)
+            return {"seconds": seconds, "samples": samples, "stacks": stacks}
+        finally:
+            self.lock.release()
+
+    @staticmethod
+    def _collapse(thread_name: str, frame) -> str:
+        functions = []
+        while frame is not None:
+            code = frame.f_code
+            functions.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        functions.append(thread_name)
+        # Root first, frames separated by semicolons as in the collapsed format
+        return ";".join(reversed(functions))
+
+    @staticmethod
+    def to_collapsed(stacks: Counter) -> str:
+        """Renders stacks as 'root;...;leaf count' lines, most frequent first.
+        Readers split on the last space, so spaces inside frame names are fine."""
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
@@ -0,0 +1,104 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional, the standard library encoder is used without it
+    orjson = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+# Media types accepted in Content-Type and Accept headers, with the aliases used by common clients
+MEDIA_TYPES = {JSON: JSON, MSGPACK: MSGPACK, "application/x-msgpack": MSGPACK, ARROW: ARROW}
+
+
+class UnsupportedMediaType(ValueError):
+    """Raised for a Content-Type or Accept header naming no supported format"""
+
+
+def content_type(header: str) -> str:
+    """Returns the format of a request body, JSON when the header is missing"""
+    media_type = (header or JSON).split(";")[0].strip().lower()
+    if media_type not in MEDIA_TYPES:
+        raise UnsupportedMediaType(f"Unsupported Content-Type '{media_type}', use one of {sorted(set(MEDIA_TYPES.values()))}")
+    return MEDIA_TYPES[media_type]
+
+def negotiate(accept: str) -> str:
+    """Returns the first supported format listed in an Accept header, JSON when any format is accepted"""
+    if not accept:
+        return JSON
+    for part in accept.split(","):
+        media_type = part.split(";")[0].strip().lower()
+        if media_type in MEDIA_TYPES:
+            return MEDIA_TYPES[media_type]
+        if media_type in ("*/*", "application/*"):
+            return JSON
+    raise UnsupportedMediaType(f"None of '{accept}' can be produced, use one of {sorted(set(MEDIA_TYPES.values()))}")
+
+def dumps_json(content) -> bytes:
+    """Encodes with orjson when installed, numpy arrays are serialised without converting them to lists"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=lambda value: value.tolist(), separators=(",", ":")).encode()
+
+def decode_frame(body: bytes, media_type: str, categorical_cols: list, numerical_cols: list):
+    """Decodes a batch of records into a model input DataFrame with the columns in the given order.
+
+    JSON and MessagePack bodies are either columnar ({"column": [values]}) or a list of records.
+    Columns are validated and converted as whole arrays, and Arrow IPC streams are read without
+    building Python objects for the numerical columns.
+    Raises ValueError for missing columns, null values or non-numeric numerical columns.
+    """
+    import numpy as np
+    import pandas as pd
+
+    columns = categorical_cols + numerical_cols
+    if media_type == ARROW:
+        import pyarrow as pa
+        table = pa.ipc.open_stream(body).read_all()
+        source = {name: table.column(name).to_pandas() for name in table.column_names if name in columns}
+    else:
+        if media_type == MSGPACK:
+            import msgpack
+            data = msgpack.unpackb(body)
+        else:
+            data = orjson.loads(body) if orjson is not None else json.loads(body)
+        if isinstance(data, list):
+            if not all(isinstance(record, dict) for record in data):
+                raise ValueError("Records must be objects")
+            data = {col: [record.get(col) for record in data] for col in columns}
+        elif not isinstance(data, dict):
+            raise ValueError("The body must be an object of columns or a list of records")
+        source = data
+
+    missing = [col for col in columns if col not in source]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+    frame = {}
+    for col in numerical_cols:
+        try:
+            frame[col] = np.asarray(source[col], dtype=float)
+        except (TypeError, ValueError):
+            raise ValueError(f"Column '{col}' must be numeric")
+    for col in categorical_cols:
+        frame[col] = np.asarray(source[col], dtype=object)
+    if len({len(values) for values in frame.values()}) > 1:
+        raise ValueError("Columns must have the same length")
+    nulls = [col for col, values in frame.items() if pd.isna(values).any()]
+    if nulls:
+        raise ValueError(f"Null values in columns: {nulls}")
+    return pd.DataFrame({col: frame[col] if col in numerical_cols else frame[col].astype(str) for col in columns})
+
+def encode_columns(columns: dict, media_type: str) -> bytes:
+    """Encodes a dict of equally long numpy arrays in the negotiated format"""
+    if media_type == ARROW:
+        import pyarrow as pa
+        table = pa.table(columns)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    if media_type == MSGPACK:
+        import msgpack
+        return msgpack.packb({name: values.tolist() for name, values in columns.items()})
+    return dumps_json(columns)
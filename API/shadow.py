@@ -0,0 +1,113 @@
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+
+class CandidateStats:
+    """Running divergence and latency statistics of one candidate against the served model.
+    Totals are exact, percentiles are computed over the most recent samples."""
+
+    def __init__(self, max_samples: int = 1000):
+        self.requests = 0
+        self.errors = 0
+        self.sum_abs_diff = 0.0
+        self.sum_abs_pct_diff = 0.0
+        self.max_abs_diff = 0.0
+        self.samples = deque(maxlen=max_samples)
+
+    def record(self, primary: float, candidate: float, primary_seconds: float, candidate_seconds: float):
+        diff = abs(candidate - primary)
+        self.requests += 1
+        self.sum_abs_diff += diff
+        self.sum_abs_pct_diff += diff / max(abs(primary), 1e-9)
+        self.max_abs_diff = max(self.max_abs_diff, diff)
+        self.samples.append((primary, candidate, primary_seconds, candidate_seconds))
+
+    def summary(self, n_recent: int = 200) -> dict:
+        samples = list(self.samples)
+
+        def latency(column):
+            if not samples:
+                return {"mean": None, "p50": None, "p95": None}
+            values = sorted(sample[column] * 1000 for sample in samples)
+            percentile = lambda q: values[round(q * (len(values) - 1))]
+            return {"mean": sum(values) / len(values), "p50": percentile(0.5), "p95": percentile(0.95)}
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "mean_abs_diff": self.sum_abs_diff / self.requests if self.requests else None,
+            "mean_abs_pct_diff": self.sum_abs_pct_diff / self.requests if self.requests else None,
+            "max_abs_diff": self.max_abs_diff,
+            "primary_latency_ms": latency(2),
+            "candidate_latency_ms": latency(3),
+            "recent": [sample[:2] for sample in samples[-n_recent:]],
+        }
+
+
+class ShadowRunner:
+    """Mirrors a fraction of prediction requests to candidate models on a background executor.
+
+    The request handler only draws a random number and submits a task, scoring happens off the
+    request path. When the executor falls behind, mirrored requests are dropped instead of queued.
+    """
+
+    def __init__(self, fraction: float = 0.1, max_workers: int = 1, max_pending: int = 100):
+        self.fraction = fraction
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shadow")
+        self.candidates = {}
+        self.stats = {}
+        self.pending = 0
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def add_candidate(self, name: str, model):
+        with self.lock:
+            self.candidates[name] = model
+            self.stats[name] = CandidateStats()
+
+    def remove_candidate(self, name: str):
+        with self.lock:
+            self.candidates.pop(name, None)
+            self.stats.pop(name, None)
+
+    def submit(self, input_data, primary_prediction: float, primary_seconds: float):
+        """Schedules shadow scoring of a request already answered by the served model"""
+        if not self.candidates or random.random() >= self.fraction:
+            return
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.dropped += 1
+                return
+            self.pending += 1
+        self.executor.submit(self._score, input_data, primary_prediction, primary_seconds)
+
+    def _score(self, input_data, primary_prediction: float, primary_seconds: float):
+        try:
+            for name, model in list(self.candidates.items()):
+                start = perf_counter()
+                try:
+                    prediction = float(model.predict(input_data)[0])
+                except Exception:
+                    with self.lock:
+                        if name in self.stats:
+                            self.stats[name].errors += 1
+                    continue
+                seconds = perf_counter() - start
+                with self.lock:
+                    if name in self.stats:
+                        self.stats[name].record(primary_prediction, prediction, primary_seconds, seconds)
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def summary(self) -> dict:
+        with self.lock:
+            candidates = {name: stats.summary() for name, stats in self.stats.items()}
+            return {"fraction": self.fraction, "pending": self.pending, "dropped": self.dropped, "candidates": candidates}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,60 +1,62 @@
-from fastapi import FastAPI, HTTPException, Depends, Request, Header
+from fastapi import FastAPI, HTTPException, Depends, Request, Header, Query
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, Response
 from pydantic import BaseModel, Field
 from typing import List
-import pickle
-import joblib
+from contextlib import asynccontextmanager
+import asyncio
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
 import toml
-import pandas as pd
 import json
-from datetime import datetime
 import os
 import re
-from time import time
+from datetime import datetime
+from time import perf_counter
+from API.middleware import IPBlacklist, RateLimiter, JsonLogWriter, RequestPipelineMiddleware, request_timings
+from API.profiling import SamplingProfiler
+from API import serialization
+from API.shadow import ShadowRunner
 
-app = FastAPI(
-    title="Property Valuation Model API",
-    description="API dedicated to run predictions on the latest version of the property_friends model",
-    version="1.0.0",
-    swagger_ui_parameters={"defaultModelsExpandDepth": -1}  # Example customization
-)
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("logs/api.log"), logging.StreamHandler()],
-)
+# Heavy dependencies (pandas, scikit-learn, category_encoders) and the model itself are loaded
+# by the lifespan task, so importing this module and answering /health stay cheap.
+# STARTUP_MODE=lazy (default) serves /health immediately and loads the model in the background,
+# STARTUP_MODE=eager finishes loading before the server accepts requests.
+STARTUP_MODE = os.environ.get("STARTUP_MODE", "lazy")
+# INFERENCE_ENGINE=compact serves predictions from the packed ensemble in compact_model.py
+INFERENCE_ENGINE = os.environ.get("INFERENCE_ENGINE", "sklearn")
+# Comma separated model paths scored in shadow on SHADOW_FRACTION of the /predict requests
+SHADOW_MODELS = [path for path in os.environ.get("SHADOW_MODELS", "").split(",") if path]
+SHADOW_FRACTION = float(os.environ.get("SHADOW_FRACTION", "0.1"))
+# Requests needed before /drift scores a feature, fewer values give meaningless PSI
+DRIFT_MIN_REQUESTS = int(os.environ.get("DRIFT_MIN_REQUESTS", "100"))
+
+# Log records are put on a queue by the request handlers and written to file/stdout by a listener thread
+log_queue = queue.SimpleQueue()
+log_formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+log_handlers = [logging.FileHandler("logs/api.log"), logging.StreamHandler()]
+for handler in log_handlers:
+    handler.setFormatter(log_formatter)
+log_listener = QueueListener(log_queue, *log_handlers)
+queue_handler = QueueHandler(log_queue)
+# Only the message is rendered before queueing, the listener's handlers add the timestamp and level
+queue_handler.setFormatter(logging.Formatter("%(message)s"))
+logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
 logger = logging.getLogger("PropertyValuationAPI")
+json_log_writer = JsonLogWriter("logs/api_logs.json")
 
 
 ########################################################################
 # Functions for API Key Validation, rate limiting, IP Blacklisting and Model Loading
 ########################################################################
 
-# In-memory store for rate limiting (user IP and timestamps)
-rate_limit_data = {}
 RATE_LIMIT = 5  # Max requests per minute
 WINDOW = 60  # Time window in seconds
+MAX_BATCH_ROWS = 10000  # Max rows scored by a single /predict_batch request
+rate_limiter = RateLimiter(max_requests=RATE_LIMIT, window=WINDOW)
 
-secrets = toml.load('API/secrets.toml')
-blacklisted_IPs = secrets['BLACKLISTED_IPS']
-
-def is_rate_limited(client_ip: str) -> bool:
-    now = time()
-    if client_ip not in rate_limit_data:
-        rate_limit_data[client_ip] = [now]
-        return False
-
-    request_times = rate_limit_data[client_ip]
-    # Remove timestamps outside the time window
-    rate_limit_data[client_ip] = [t for t in request_times if now - t < WINDOW]
-
-    # Check if requests exceed the rate limit
-    if len(rate_limit_data[client_ip]) >= RATE_LIMIT:
-        return True
-
-    # Log the current request time
-    rate_limit_data[client_ip].append(now)
-    return False
+# Filled from API/secrets.toml on startup, accepts single addresses and CIDR networks
+ip_blacklist = IPBlacklist()
 
 # Dependency for API key validation
 def validate_api_key(api_key: str = ""):
@@ -65,6 +67,14 @@ def validate_api_key(api_key: str = ""):
         raise HTTPException(status_code=401, detail="Invalid API Key")
     return api_key
 
+# Admin endpoints expose internals of the worker, they take their own key and never the client one
+def validate_admin_key(api_key: str = Header(None, alias='Authorization')):
+    admin_key = toml.load('API/secrets.toml').get('admin')
+    if not admin_key or api_key != admin_key:
+        logger.warning(f"Unauthorized admin access attempt with API key: {api_key}")
+        raise HTTPException(status_code=403, detail="Invalid admin API key")
+    return api_key
+
 # Function to find the highest version model file
 def get_latest_model_path(models_dir="models", model_prefix="property_friends"):
     model_files = [f for f in os.listdir(models_dir) if re.match(rf"{model_prefix}_v\d+\.joblib", f)]
@@ -75,16 +85,100 @@ def get_latest_model_path(models_dir="models", model_prefix="property_friends"):
     model_files.sort(key=lambda x: int(re.search(r"_v(\d+)", x).group(1)), reverse=True)
     return os.path.join(models_dir, model_files[0])
 
-# Load the trained model
-model_path = get_latest_model_path()
-if model_path.endswith('.joblib'):
-    with open(model_path, "rb") as f:
-        model = joblib.load(f)
-elif model_path.endswith('.pkl'):
-    with open(model_path, "rb") as f:
-        model = pickle.load(f)
-else:
-    raise ValueError("Unsupported model file format")
+# Candidate models scored off the request path, their predictions are never returned to clients
+shadow_runner = ShadowRunner(fraction=SHADOW_FRACTION)
+
+# On-demand sampling of the live worker through /admin/profile
+profiler = SamplingProfiler(max_seconds=60)
+
+# Populated by warm_up() once the worker is ready to serve predictions
+model = None
+model_path = None
+features = None
+drift_monitor = None
+startup_state = {"status": "starting", "error": None, "timings": {}}
+
+def warm_up():
+    """Imports the heavy dependencies and loads the latest model, recording how long each step takes"""
+    global model, model_path, features, drift_monitor
+    startup_state["status"] = "loading"
+    try:
+        start = perf_counter()
+        # Imported here so the time spent loading the scientific stack is measured separately from the model
+        import pandas, sklearn, category_encoders
+        import features as feature_definitions
+        from train_model import load_model
+        startup_state["timings"]["import_seconds"] = perf_counter() - start
+
+        start = perf_counter()
+        latest_model_path = get_latest_model_path()
+        loaded_model = load_model(latest_model_path)
+        # Models trained before the reference profile was introduced are served without drift monitoring
+        reference_profile = getattr(loaded_model, "reference_profile_", None)
+        if INFERENCE_ENGINE == "compact":
+            from compact_model import compact_pipeline
+            loaded_model = compact_pipeline(loaded_model)
+        startup_state["timings"]["model_load_seconds"] = perf_counter() - start
+
+        for shadow_model_path in SHADOW_MODELS:
+            try:
+                shadow_runner.add_candidate(os.path.basename(shadow_model_path), load_model(shadow_model_path))
+            except Exception as e:
+                # A broken candidate must not keep the worker from serving the main model
+                logger.error(f"Error loading shadow model {shadow_model_path}: {e}")
+    except Exception as e:
+        startup_state["status"] = "failed"
+        startup_state["error"] = str(e)
+        logger.error(f"Error during startup: {e}")
+        return
+
+    if reference_profile is not None:
+        from drift import DriftMonitor
+        drift_monitor = DriftMonitor(reference_profile, min_requests=DRIFT_MIN_REQUESTS)
+    features, model, model_path = feature_definitions, loaded_model, latest_model_path
+    startup_state["status"] = "ready"
+    logger.info(f"Model {model_path} ready, startup timings: {startup_state['timings']}")
+
+def require_model():
+    """Raises a 503 while the worker is still warming up"""
+    if startup_state["status"] != "ready":
+        raise HTTPException(status_code=503, detail=f"Model not ready: {startup_state['status']}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_listener.start()
+    json_log_writer.start()
+    ip_blacklist.update(toml.load('API/secrets.toml')['BLACKLISTED_IPS'])
+    if STARTUP_MODE == "eager":
+        await asyncio.to_thread(warm_up)
+        warm_up_task = None
+    else:
+        warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    yield
+    if warm_up_task is not None:
+        await warm_up_task
+    shadow_runner.shutdown()
+    json_log_writer.stop()
+    log_listener.stop()
+
+app = FastAPI(
+    title="Property Valuation Model API",
+    description="API dedicated to run predictions on the latest version of the property_friends model",
+    version="1.0.0",
+    swagger_ui_parameters={"defaultModelsExpandDepth": -1},  # Example customization
+    # orjson encodes responses several times faster than the standard library when it is installed
+    default_response_class=ORJSONResponse if serialization.orjson is not None else JSONResponse,
+    lifespan=lifespan
+)
+app.add_middleware(
+    RequestPipelineMiddleware,
+    blacklist=ip_blacklist,
+    rate_limiter=rate_limiter,
+    json_log_writer=json_log_writer,
+    logger=logger,
+    # A sensitivity grid is scored in one call, so it counts as a single request
+    rate_limited_paths=("/predict", "/predict_batch", "/sensitivity")
+)
 
 # Define the schema for property data
 class PropertyData(BaseModel):
@@ -100,12 +194,40 @@ class PropertyData(BaseModel):
 class PredictionResponse(BaseModel):
     price: float
 
-# Health check endpoint
+class FeatureRange(BaseModel):
+    feature: str
+    start: float
+    stop: float
+    steps: int = Field(10, ge=2, le=50)
+
+class SensitivityRequest(BaseModel):
+    base: PropertyData
+    ranges: List[FeatureRange] = Field(min_length=1, max_length=2)
+
+class SensitivityResponse(BaseModel):
+    base_price: float
+    features: List[str]
+    axes: List[List[float]]
+    # Nested by axis: prices[i] for one range, prices[i][j] for two
+    prices: list
+
+# Health check endpoint (liveness: the process is up, the model may still be loading)
 @app.get("/health", tags=["Basic Operations"])
 def health_check():
     logger.info("Health check endpoint called")
     return {"status": "ok"}
 
+# Readiness endpoint: only returns 200 once the model is loaded and predictions can be served
+@app.get("/ready", tags=["Basic Operations"])
+def readiness_check():
+    content = {
+        "status": startup_state["status"],
+        "model_path": model_path,
+        "startup_timings": startup_state["timings"],
+        "error": startup_state["error"]
+    }
+    return JSONResponse(content=content, status_code=200 if startup_state["status"] == "ready" else 503)
+
 # Version information endpoint
 @app.get("/version", tags=["Basic Operations"])
 def get_version():
@@ -128,7 +250,7 @@ def get_docs_link():
 def get_status():
     status = {
         "api_status": "running",
-        "model_status": "loaded",
+        "model_status": startup_state["status"],
         "dependencies": {
             "database": "connected",
             "external_api": "reachable"
@@ -144,24 +266,34 @@ def predict_property(
     property_data: PropertyData, 
     api_key: str = Header(None, alias='Authorization')
 ):
+    # Stage timings requested with the X-Trace header, None otherwise
+    timings = request_timings.get()
+    start = perf_counter()
+
     # Validate the API key
     validate_api_key(api_key)
+    require_model()
     
     try:
         # Convert input data to the model's expected format
-        input_data = pd.DataFrame([{
-            'type': property_data.type,
-            'sector': property_data.sector,
-            'net_usable_area': property_data.net_usable_area,
-            'net_area': property_data.net_area,
-            'n_rooms': property_data.n_rooms,
-            'n_bathroom': property_data.n_bathroom,
-            'latitude': property_data.latitude,
-            'longitude': property_data.longitude,
-        }])
+        record = property_data.model_dump()
+        prepare_start = perf_counter()
+        input_data = features.to_frame([record])
         
         # Generate prediction
-        prediction = model.predict(input_data)[0]
+        predict_start = perf_counter()
+        prediction = float(model.predict(input_data)[0])
+        predict_end = perf_counter()
+        shadow_runner.submit(input_data, prediction, predict_end - predict_start)
+        if drift_monitor is not None:
+            drift_monitor.update(record)
+        if timings is not None:
+            timings.update({
+                "auth": prepare_start - start,
+                "prepare": predict_start - prepare_start,
+                "predict": predict_end - predict_start,
+                "monitoring": perf_counter() - predict_end
+            })
         logger.info("Prediction generated successfully")
         return PredictionResponse(price=prediction)
     except HTTPException as http_exc:
@@ -170,16 +302,127 @@ def predict_property(
         logger.error(f"Error during prediction: {e}")
         raise HTTPException(status_code=500, detail="Prediction failed")
 
+async def read_body(request: Request) -> bytes:
+    """Reads the raw request body on the event loop, so the endpoint using it can be a plain def"""
+    return await request.body()
+
+# Batch prediction endpoint: JSON, MessagePack or Arrow IPC bodies, negotiated with Content-Type and Accept.
+# A plain def like the other endpoints: key validation (a file read), decoding and scoring run in the threadpool.
+@app.post("/predict_batch", tags=["Model Endpoints"])
+def predict_batch(
+    body: bytes = Depends(read_body),
+    content_type: str = Header(None),
+    accept: str = Header(None),
+    api_key: str = Header(None, alias='Authorization')
+):
+    validate_api_key(api_key)
+    require_model()
+    try:
+        request_format = serialization.content_type(content_type)
+    except serialization.UnsupportedMediaType as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    try:
+        response_format = serialization.negotiate(accept)
+    except serialization.UnsupportedMediaType as e:
+        raise HTTPException(status_code=406, detail=str(e))
+
+    content = score_batch(body, request_format, response_format)
+    return Response(content=content, media_type=response_format)
+
+def score_batch(body: bytes, request_format: str, response_format: str) -> bytes:
+    """Decodes a batch straight into a DataFrame, scores it in one call and encodes the prices"""
+    timings = request_timings.get()
+    decode_start = perf_counter()
+    try:
+        input_data = serialization.decode_frame(body, request_format, features.CATEGORICAL_FEATURES, features.NUMERICAL_FEATURES)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Invalid batch: {e}")
+    if not 0 < len(input_data) <= MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413 if len(input_data) else 422, detail=f"Batches must have between 1 and {MAX_BATCH_ROWS} rows")
+
+    try:
+        predict_start = perf_counter()
+        prices = model.predict(input_data)
+        predict_end = perf_counter()
+        if drift_monitor is not None:
+            drift_monitor.update_batch(input_data)
+        encode_start = perf_counter()
+        content = serialization.encode_columns({"price": prices}, response_format)
+    except Exception as e:
+        logger.error(f"Error during batch prediction: {e}")
+        raise HTTPException(status_code=500, detail="Prediction failed")
+    if timings is not None:
+        timings.update({
+            "decode": predict_start - decode_start,
+            "predict": predict_end - predict_start,
+            "monitoring": encode_start - predict_end,
+            "encode": perf_counter() - encode_start
+        })
+    logger.info(f"Batch of {len(input_data)} predictions generated successfully")
+    return content
+
+# What-if endpoint: prices a grid of variations of one property in a single vectorized call
+@app.post("/sensitivity", response_model=SensitivityResponse, tags=["Model Endpoints"])
+def price_sensitivity(
+    request: SensitivityRequest,
+    api_key: str = Header(None, alias='Authorization')
+):
+    timings = request_timings.get()
+    validate_api_key(api_key)
+    require_model()
+
+    names = [feature_range.feature for feature_range in request.ranges]
+    invalid = [name for name in names if name not in features.NUMERICAL_FEATURES]
+    if invalid or len(set(names)) != len(names):
+        raise HTTPException(status_code=400, detail=f"Ranges must cover distinct features among {features.NUMERICAL_FEATURES}")
+
+    import numpy as np
+    import pandas as pd
+    try:
+        prepare_start = perf_counter()
+        base = request.base.model_dump()
+        axes = [np.linspace(r.start, r.stop, r.steps) for r in request.ranges]
+        grid = features.sensitivity_grid(base, dict(zip(names, axes)))
+        # The base property is scored in the same call, as the last row
+        input_data = pd.concat([grid, features.to_frame([base])], ignore_index=True)
+
+        predict_start = perf_counter()
+        predictions = model.predict(input_data)
+        if timings is not None:
+            timings.update({"prepare": predict_start - prepare_start, "predict": perf_counter() - predict_start})
+        # Synthetic rows are kept out of the shadow and drift statistics, which describe real traffic
+        logger.info(f"Sensitivity grid of {len(grid)} rows scored")
+        return SensitivityResponse(
+            base_price=float(predictions[-1]),
+            features=names,
+            axes=[axis.tolist() for axis in axes],
+            prices=predictions[:-1].reshape([len(axis) for axis in axes]).tolist()
+        )
+    except Exception as e:
+        logger.error(f"Error during sensitivity analysis: {e}")
+        raise HTTPException(status_code=500, detail="Sensitivity analysis failed")
+
 # Model metadata endpoint
 @app.get("/model_metadata", tags=["Model Endpoints"])
 def get_model_metadata():
+    require_model()
     metadata = {
         "model_path": model_path,
-        "features": ["type", "sector", "net_usable_area", "net_area", "n_rooms", "n_bathroom", "latitude", "longitude"],
+        "features": features.SERVING_FEATURES,
+        "derived_features": features.get_derived_features(model),
+        "training_only_features": features.TRAINING_ONLY_FEATURES,
         "training_date": "2023-01-01"
     }
     return metadata
 
+# Input drift endpoint
+@app.get("/drift", tags=["Model Endpoints"])
+def get_drift():
+    require_model()
+    if drift_monitor is None:
+        raise HTTPException(status_code=404, detail="The served model has no reference profile, retrain it to enable drift monitoring")
+    return drift_monitor.summary()
+
 # Model history endpoint
 @app.get("/model_history", tags=["Model Endpoints"])
 def get_model_history():
@@ -191,61 +434,60 @@ def get_model_history():
         logger.error(f"Error fetching model history: {e}")
         raise HTTPException(status_code=500, detail="Could not fetch model history")
 
+class ShadowModelRequest(BaseModel):
+    model_file: str
 
-# Additional logger for JSON logs
-json_logger = logging.getLogger("PropertyValuationAPI_JSON")
-json_handler = logging.FileHandler("logs/api_logs.json")
-json_handler.setFormatter(logging.Formatter('%(message)s'))
-json_logger.addHandler(json_handler)
-json_logger.setLevel(logging.INFO)
-
-@app.middleware("http")
-async def ip_blacklist_middleware(request: Request, call_next):
-    client_ip = request.client.host
-    if client_ip in blacklisted_IPs:
-        raise HTTPException(status_code=403, detail="Access forbidden: IP blacklisted")
-    return await call_next(request)
-
-@app.middleware("http")
-async def rate_limit_middleware(request: Request, call_next):
-    client_ip = request.client.host
-    # Check if the route is the prediction endpoint
-    if request.url.path == "/predict" and is_rate_limited(client_ip):
-        raise HTTPException(status_code=429, detail="Rate limit exceeded: Please wait before trying again.")
-    return await call_next(request)
+# Shadow statistics endpoint
+@app.get("/shadow_stats", tags=["Model Endpoints"])
+def get_shadow_stats():
+    return shadow_runner.summary()
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = datetime.now()
-    logger.info(f"Incoming request: {request.method} {request.url}")
-    
-    response = await call_next(request)
-    
-    end_time = datetime.now()
-    duration = (end_time - start_time).total_seconds()
-    log_data = {
-        "timestamp": start_time.isoformat(),
-        "endpoint": str(request.url.path),
-        "method": request.method,
-        "status_code": response.status_code,
-        "duration": duration,
-        "error": None if response.status_code == 200 else response.body.decode()
-    }
-    
-    # Write JSON log
-    if os.path.exists("logs/api_logs.json") and os.path.getsize("logs/api_logs.json") > 0:
-        with open("logs/api_logs.json", "r+") as f:
-            content = f.read().strip()
-            if content.endswith(']'):
-                content = content[:-1] + ",\n" + json.dumps(log_data) + "\n]"
-            else:
-                content = "[\n" + json.dumps(log_data) + "\n]"
-            f.seek(0)
-            f.write(content)
-            f.truncate()
-    else:
-        with open("logs/api_logs.json", "w") as f:
-            f.write("[\n" + json.dumps(log_data) + "\n]")
+# Register a stored model version as shadow candidate
+@app.post("/shadow_models", tags=["Model Endpoints"])
+def add_shadow_model(
+    request: ShadowModelRequest,
+    api_key: str = Header(None, alias='Authorization')
+):
+    validate_api_key(api_key)
+    require_model()
+    if not re.fullmatch(r"property_friends_v\d+\.(joblib|pkl)", request.model_file):
+        raise HTTPException(status_code=400, detail="Invalid model file name")
+    candidate_path = os.path.join("models", request.model_file)
+    if not os.path.exists(candidate_path):
+        raise HTTPException(status_code=404, detail="Model file not found")
+
+    from train_model import load_model
+    shadow_runner.add_candidate(request.model_file, load_model(candidate_path))
+    logger.info(f"Shadow candidate {request.model_file} registered")
+    return {"candidates": list(shadow_runner.candidates)}
+
+# Stop scoring a shadow candidate
+@app.delete("/shadow_models/{model_file}", tags=["Model Endpoints"])
+def remove_shadow_model(
+    model_file: str,
+    api_key: str = Header(None, alias='Authorization')
+):
+    validate_api_key(api_key)
+    shadow_runner.remove_candidate(model_file)
+    logger.info(f"Shadow candidate {model_file} removed")
+    return {"candidates": list(shadow_runner.candidates)}
+
+# Profiling endpoint: samples the stacks of every thread of this worker while it serves live traffic
+@app.get("/admin/profile", response_class=PlainTextResponse, tags=["Admin"])
+def profile_worker(
+    seconds: float = Query(10, gt=0, le=60),
+    interval_ms: float = Query(5, ge=1, le=100),
+    api_key: str = Depends(validate_admin_key)
+):
+    try:
+        # Runs in the threadpool, the event loop keeps serving the traffic being profiled
+        result = profiler.profile(seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.info(f"Profile of {result['seconds']}s collected with {result['samples']} samples")
 
-    logger.info(f"Response status: {response.status_code}")
-    return response
\ No newline at end of file
+    filename = f"profile_pid{os.getpid()}_{datetime.now():%Y%m%d_%H%M%S}.collapsed"
+    return PlainTextResponse(
+        SamplingProfiler.to_collapsed(result["stacks"]),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Profile-Samples": str(result["samples"])}
+    )
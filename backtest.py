@@ -0,0 +1,154 @@
+import pandas as pd
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+import argparse
+import glob
+import json
+import os
+import re
+from datetime import datetime
+import data_processing
+import features
+import train_model
+
+LEADERBOARD_PATH = "models/backtest_leaderboard.json"
+
+# Evaluation dataset of the current worker process, set once by init_worker
+_evaluation_data = None
+
+
+def load_evaluation_data(data_source: str, test_path: str = None, db_url: str = None, table_name: str = None) -> pd.DataFrame:
+    """Loads the fixed evaluation set (the 'is_test' split) with every column any stored version was trained on.
+    Older versions also expect 'is_test' and the target-derived 'price_per_sq_meter', so both are added."""
+    if data_source == 'csv':
+        if not test_path:
+            raise ValueError("For CSV data source, test_path must be provided.")
+        data = pd.read_csv(test_path)
+    elif data_source == 'db':
+        if not db_url or not table_name:
+            raise ValueError("For DB data source, both db_url and table_name must be provided.")
+        _, data = train_model.load_data_from_db(db_url, table_name)
+    else:
+        raise ValueError("Invalid data source. Choose either 'csv' or 'db'.")
+
+    data = data_processing.remove_invalid_rows(data)
+    data = data_processing.feature_engineering(data.copy())
+    data['is_test'] = True
+    return data.reset_index(drop=True)
+
+def dataset_fingerprint(data: pd.DataFrame) -> str:
+    """Hash of the evaluation rows, so leaderboards computed on different data can be told apart"""
+    return format(int(pd.util.hash_pandas_object(data, index=False).sum()) & (2 ** 64 - 1), '016x')
+
+def list_model_versions(models_dir: str = "models", model_prefix: str = "property_friends") -> list:
+    """Returns every stored .pkl and .joblib artifact sorted by version"""
+    pattern = re.compile(rf"{model_prefix}_v(\d+)\.(joblib|pkl)$")
+    paths = [path for path in glob.glob(os.path.join(models_dir, f"{model_prefix}_v*.*")) if pattern.search(path)]
+    return sorted(paths, key=lambda path: int(pattern.search(path).group(1)))
+
+def consumed_columns(model) -> list:
+    """Input columns that reach the estimator: those selected by the transformers of the fitted ColumnTransformer,
+    the remainder included when it is not dropped. Without a ColumnTransformer every input column counts as used."""
+    for _, step in getattr(model, "steps", []):
+        if isinstance(step, ColumnTransformer):
+            names = np.asarray(step.feature_names_in_, dtype=object)
+            used = []
+            for _, transformer, columns in step.transformers_:
+                if isinstance(transformer, str) and transformer == "drop":
+                    continue
+                if isinstance(columns, (str, int)):
+                    columns = [columns]
+                if isinstance(columns, slice) or not all(isinstance(col, str) for col in columns):
+                    # Positions, slices and boolean masks refer to the ColumnTransformer's input columns
+                    columns = names[columns]
+                used.extend(str(col) for col in columns)
+            return used
+    return list(getattr(model, "feature_names_in_", features.SERVING_FEATURES))
+
+def init_worker(data: pd.DataFrame):
+    """Keeps the evaluation set in the worker. With the fork start method the parent's frame is inherited
+    copy-on-write, otherwise it is unpickled once per worker rather than once per model."""
+    global _evaluation_data
+    _evaluation_data = data
+
+def evaluate_version(model_path: str, repeats: int = 3) -> dict:
+    """Loads one artifact and scores it on the shared evaluation set"""
+    data = _evaluation_data
+    result = {"model": model_path, "size_bytes": os.path.getsize(model_path)}
+    try:
+        start = perf_counter()
+        model = train_model.load_model(model_path)
+        result["load_seconds"] = perf_counter() - start
+
+        inputs = data.drop(columns=[features.TARGET])
+        # First call pays for lazy initialisation, it is left out of the latency
+        model.predict(inputs.head(1))
+        timings = []
+        for _ in range(repeats):
+            start = perf_counter()
+            predictions = model.predict(inputs)
+            timings.append(perf_counter() - start)
+    except Exception as e:
+        result.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+        return result
+
+    metrics = train_model.get_metrics(predictions, data[features.TARGET].values)
+    result.update({
+        "status": "ok",
+        "RMSE": float(metrics["RMSE"]),
+        "MAPE": float(metrics["MAPE"]),
+        "MAE": float(metrics["MAE"]),
+        "latency_ms_per_1k_rows": min(timings) / len(inputs) * 1000 * 1000,
+        # Only columns the estimator actually consumes count, older pipelines drop most of their inputs
+        "target_leakage": sorted(set(consumed_columns(model)) & set(features.TRAINING_ONLY_FEATURES)),
+    })
+    return result
+
+def backtest(data: pd.DataFrame, model_paths: list, workers: int = None, repeats: int = 3) -> list:
+    """Scores every model in parallel and returns the results ranked by RMSE, failed versions last"""
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(data,)) as executor:
+        futures = {executor.submit(evaluate_version, path, repeats): path for path in model_paths}
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if result["status"] == "ok":
+                print(f"{result['model']}: RMSE {result['RMSE']:.2f}, {result['latency_ms_per_1k_rows']:.2f} ms/1k rows")
+            else:
+                print(f"{result['model']}: {result['error']}")
+
+    results.sort(key=lambda result: (result["status"] != "ok", bool(result.get("target_leakage")), result.get("RMSE", np.inf)))
+    for rank, result in enumerate(results, start=1):
+        result["rank"] = rank
+    return results
+
+def save_leaderboard(results: list, data: pd.DataFrame, data_source: str, filename: str = LEADERBOARD_PATH):
+    """Writes the leaderboard together with a description of the evaluation set"""
+    leaderboard = {
+        "timestamp": datetime.now().isoformat(),
+        "dataset": {"source": data_source, "rows": int(len(data)), "fingerprint": dataset_fingerprint(data)},
+        "models": results,
+    }
+    with open(filename, 'w') as f:
+        json.dump(leaderboard, f, indent=4)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Backtest every stored model version on the same evaluation set')
+    parser.add_argument('--data_source', type=str, required=True, choices=['csv', 'db'], help='Data source: "csv" or "db"')
+    parser.add_argument('--test', type=str, help='Path to the testing CSV file (if using CSV)')
+    parser.add_argument('--db_url', type=str, help='Database connection string (if using DB)')
+    parser.add_argument('--table_name', type=str, help='Name of the table in the database (if using DB)')
+    parser.add_argument('--models_dir', type=str, default='models', help='Directory with the stored model versions')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed predictions per model, the fastest is kept')
+    parser.add_argument('--output', type=str, default=LEADERBOARD_PATH, help='Path of the leaderboard JSON file')
+    args = parser.parse_args()
+
+    start = perf_counter()
+    data = load_evaluation_data(args.data_source, args.test, args.db_url, args.table_name)
+    model_paths = list_model_versions(args.models_dir)
+    results = backtest(data, model_paths, args.workers, args.repeats)
+    save_leaderboard(results, data, args.data_source, args.output)
+    print(f"Backtested {len(model_paths)} models on {len(data)} rows in {perf_counter() - start:.1f}s, leaderboard saved to {args.output}")
@@ -0,0 +1,79 @@
+import argparse
+import os
+import pickle
+import re
+import sys
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import features
+from train_model import load_model
+from compact_model import compact_pipeline, check_parity
+
+
+def time_per_1k_rows(predict, X, repeats: int = 5) -> float:
+    """Returns the best time in milliseconds to score 1000 rows"""
+    best = np.inf
+    for _ in range(repeats):
+        start = perf_counter()
+        predict(X)
+        best = min(best, perf_counter() - start)
+    return best / len(X) * 1000 * 1000
+
+def time_single_row(predict, X, n: int = 200) -> float:
+    """Returns the average time in milliseconds to score one row at a time"""
+    start = perf_counter()
+    for i in range(n):
+        predict(X[i % len(X):i % len(X) + 1])
+    return (perf_counter() - start) / n * 1000
+
+def benchmark_version(model_path: str, data: pd.DataFrame) -> dict:
+    """Packs one stored model and compares parity, memory and latency with the original ensemble"""
+    pipeline = load_model(model_path)
+    gbr = pipeline.steps[-1][1]
+    compact = compact_pipeline(pipeline)
+    compact_f32 = compact_pipeline(pipeline, dtype=np.float32)
+    X = pipeline[:-1].transform(data)
+
+    return {
+        "model": os.path.basename(model_path),
+        "n_trees": len(gbr.estimators_),
+        "max_abs_relative_diff": check_parity(pipeline, compact, data),
+        "max_abs_relative_diff_float32": check_parity(pipeline, compact_f32, data, rtol=1e-4),
+        "sklearn_pickle_kb": len(pickle.dumps(gbr)) / 1024,
+        "compact_kb": compact.ensemble.nbytes / 1024,
+        "compact_float32_kb": compact_f32.ensemble.nbytes / 1024,
+        "sklearn_ms_per_1k": time_per_1k_rows(gbr.predict, X),
+        "compact_ms_per_1k": time_per_1k_rows(compact.ensemble.predict, X),
+        "compact_float32_ms_per_1k": time_per_1k_rows(compact_f32.ensemble.predict, X),
+        "sklearn_single_row_ms": time_single_row(gbr.predict, X),
+        "compact_single_row_ms": time_single_row(compact.ensemble.predict, X),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare the compact ensemble with the stored scikit-learn models')
+    parser.add_argument('--data', type=str, default='provided/test.csv', help='CSV file used for parity and latency')
+    parser.add_argument('--models_dir', type=str, default='models', help='Directory with the stored model versions')
+    parser.add_argument('--output', type=str, help='Optional CSV file to save the results')
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data)[features.SERVING_FEATURES]
+    model_files = sorted(
+        (f for f in os.listdir(args.models_dir) if re.match(r"property_friends_v\d+\.(joblib|pkl)$", f)),
+        key=lambda x: int(re.search(r"_v(\d+)", x).group(1))
+    )
+
+    results = []
+    for model_file in model_files:
+        try:
+            results.append(benchmark_version(os.path.join(args.models_dir, model_file), data))
+        except Exception as e:
+            print(f"{model_file}: {e}")
+    results = pd.DataFrame(results)
+    print(results.to_string(index=False, float_format=lambda x: f"{x:.4g}"))
+    if args.output:
+        results.to_csv(args.output, index=False)
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import argparse
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from features import GeoNeighborFeatures
+
+
+def sample_listings(data: pd.DataFrame, n_rows: int, random_state: int = 42) -> pd.DataFrame:
+    """Samples n_rows listings with replacement, jittering coordinates so the index sees distinct points"""
+    rng = np.random.default_rng(random_state)
+    sample = data.sample(n=n_rows, replace=n_rows > len(data), random_state=random_state).reset_index(drop=True)
+    sample["latitude"] = sample["latitude"] + rng.normal(0, 1e-4, n_rows)
+    sample["longitude"] = sample["longitude"] + rng.normal(0, 1e-4, n_rows)
+    return sample
+
+def benchmark_geo_index(data: pd.DataFrame, sizes: list, n_queries: int = 1000, batch_size: int = 1000) -> pd.DataFrame:
+    """Measures BallTree build time and single/batch query latency as the training set grows"""
+    queries = sample_listings(data, n_queries, random_state=0)
+    batch = sample_listings(data, batch_size, random_state=1)
+    results = []
+    for size in sizes:
+        train = sample_listings(data, size)
+        geo = GeoNeighborFeatures()
+
+        start = perf_counter()
+        geo.fit(train, train["price"])
+        build_time = perf_counter() - start
+
+        latitude, longitude = queries["latitude"].to_numpy(), queries["longitude"].to_numpy()
+        start = perf_counter()
+        for i in range(n_queries):
+            geo.neighbor_features(latitude[i:i + 1], longitude[i:i + 1])
+        single_latency = (perf_counter() - start) / n_queries
+
+        # Same single-row lookup through the DataFrame transform used by the pipeline
+        start = perf_counter()
+        for i in range(n_queries):
+            geo.transform(queries.iloc[i:i + 1])
+        transform_latency = (perf_counter() - start) / n_queries
+
+        start = perf_counter()
+        geo.neighbor_features(batch["latitude"], batch["longitude"])
+        batch_latency = (perf_counter() - start) / batch_size
+
+        results.append({
+            "training_rows": size,
+            "build_time_s": build_time,
+            "single_query_ms": single_latency * 1000,
+            "single_transform_ms": transform_latency * 1000,
+            "batch_query_ms_per_row": batch_latency * 1000,
+        })
+    return pd.DataFrame(results)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the geo-neighbour index build time and query latency')
+    parser.add_argument('--train', type=str, default='provided/train.csv', help='Path to the training CSV file')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000], help='Training set sizes to benchmark')
+    parser.add_argument('--n_queries', type=int, default=1000, help='Number of single-row queries to time')
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.train)
+    data = data[(data['price'] > 0) & (data['net_usable_area'] > 0)]
+    print(benchmark_geo_index(data, args.sizes, args.n_queries).to_string(index=False))
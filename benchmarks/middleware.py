@@ -0,0 +1,200 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from time import perf_counter
+
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from API.middleware import IPBlacklist, RateLimiter, JsonLogWriter, RequestPipelineMiddleware
+
+
+def build_legacy_app(log_dir: str, blacklist: list) -> FastAPI:
+    """Reproduces the previous stack of three @app.middleware functions with blocking file I/O"""
+    app = FastAPI()
+    logger = logging.getLogger("benchmark.legacy")
+    logger.propagate = False
+    logger.addHandler(logging.FileHandler(os.path.join(log_dir, "api.log")))
+    logger.setLevel(logging.INFO)
+    json_path = os.path.join(log_dir, "api_logs.json")
+    rate_limit_data = {}
+
+    @app.get("/predict")
+    async def predict():
+        return {"price": 1.0}
+
+    @app.middleware("http")
+    async def ip_blacklist_middleware(request: Request, call_next):
+        if request.client.host in blacklist:
+            raise HTTPException(status_code=403, detail="Access forbidden: IP blacklisted")
+        return await call_next(request)
+
+    @app.middleware("http")
+    async def rate_limit_middleware(request: Request, call_next):
+        # Same bookkeeping as the old is_rate_limited, with a limit that is never reached
+        rate_limit_data.setdefault(request.client.host, []).append(perf_counter())
+        return await call_next(request)
+
+    @app.middleware("http")
+    async def log_requests(request: Request, call_next):
+        start_time = datetime.now()
+        logger.info(f"Incoming request: {request.method} {request.url}")
+        response = await call_next(request)
+        log_data = {
+            "timestamp": start_time.isoformat(),
+            "endpoint": str(request.url.path),
+            "method": request.method,
+            "status_code": response.status_code,
+            "duration": (datetime.now() - start_time).total_seconds(),
+            "error": None
+        }
+        if os.path.exists(json_path) and os.path.getsize(json_path) > 0:
+            with open(json_path, "r+") as f:
+                content = f.read().strip()
+                content = content[:-1] + ",\n" + json.dumps(log_data) + "\n]"
+                f.seek(0)
+                f.write(content)
+                f.truncate()
+        else:
+            with open(json_path, "w") as f:
+                f.write("[\n" + json.dumps(log_data) + "\n]")
+        logger.info(f"Response status: {response.status_code}")
+        return response
+
+    app.state.stop = lambda: None
+    return app
+
+def build_pipeline_app(log_dir: str, blacklist: list) -> FastAPI:
+    """Builds the same endpoint behind the single RequestPipelineMiddleware"""
+    app = FastAPI()
+    log_queue = SimpleQueue()
+    listener = QueueListener(log_queue, logging.FileHandler(os.path.join(log_dir, "api.log")))
+    logger = logging.getLogger("benchmark.pipeline")
+    logger.propagate = False
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    json_log_writer = JsonLogWriter(os.path.join(log_dir, "api_logs.json"))
+    listener.start()
+    json_log_writer.start()
+
+    @app.get("/predict")
+    async def predict():
+        return {"price": 1.0}
+
+    app.add_middleware(
+        RequestPipelineMiddleware,
+        blacklist=IPBlacklist(blacklist),
+        rate_limiter=RateLimiter(max_requests=10 ** 9),
+        json_log_writer=json_log_writer,
+        logger=logger
+    )
+
+    def stop():
+        json_log_writer.stop()
+        listener.stop()
+
+    app.state.stop = stop
+    return app
+
+async def call(app, path: str = "/predict") -> int:
+    """Sends a single GET request straight to the ASGI app and returns the status code"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"benchmark")], "client": ("127.0.0.1", 50000), "server": ("benchmark", 80),
+    }
+    status = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+
+    await app(scope, receive, send)
+    return status["code"]
+
+async def measure_throughput(app, n_requests: int, concurrency: int) -> dict:
+    """Closed loop: concurrent clients send requests back to back as fast as the app answers"""
+    async def client(n: int):
+        statuses = []
+        for _ in range(n):
+            statuses.append(await call(app))
+            await asyncio.sleep(0)
+        return statuses
+
+    start = perf_counter()
+    per_client = await asyncio.gather(*(client(n_requests // concurrency) for _ in range(concurrency)))
+    elapsed = perf_counter() - start
+    statuses = [status for statuses in per_client for status in statuses]
+    return {
+        "requests_per_second": len(statuses) / elapsed,
+        "errors": sum(status != 200 for status in statuses),
+    }
+
+async def measure_loop_lag(app, n_requests: int, rate: float, probe_interval: float = 0.001) -> dict:
+    """Open loop: requests arrive at a fixed rate while a probe task records how late the event loop wakes it"""
+    lags = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            start = perf_counter()
+            await asyncio.sleep(probe_interval)
+            lags.append(perf_counter() - start - probe_interval)
+
+    probe_task = asyncio.create_task(probe())
+    tasks = []
+    next_time = perf_counter()
+    for _ in range(n_requests):
+        tasks.append(asyncio.create_task(call(app)))
+        next_time += 1 / rate
+        await asyncio.sleep(max(0, next_time - perf_counter()))
+    await asyncio.gather(*tasks)
+    done.set()
+    await probe_task
+
+    lags = np.array(lags) * 1000
+    return {
+        "loop_lag_p50_ms": float(np.percentile(lags, 50)),
+        "loop_lag_p99_ms": float(np.percentile(lags, 99)),
+        "loop_lag_max_ms": float(lags.max()),
+    }
+
+def benchmark_middleware(n_requests: int, concurrency: int, rate: float, blacklist_size: int) -> dict:
+    """Runs the legacy and the pipeline middleware stacks against the same load.
+    The JSON log starts empty for each phase, so the legacy stack is measured at its best."""
+    blacklist = [f"10.{i // 256 % 256}.{i % 256}.1" for i in range(blacklist_size)]
+    results = {}
+    for name, build in [("legacy", build_legacy_app), ("pipeline", build_pipeline_app)]:
+        results[name] = {}
+        for measure in [
+            lambda app: measure_throughput(app, n_requests, concurrency),
+            lambda app: measure_loop_lag(app, n_requests, rate)
+        ]:
+            with tempfile.TemporaryDirectory() as log_dir:
+                app = build(log_dir, blacklist)
+                results[name].update(asyncio.run(measure(app)))
+                app.state.stop()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark event-loop lag and throughput of the request middleware')
+    parser.add_argument('--n_requests', type=int, default=5000, help='Number of requests to send')
+    parser.add_argument('--concurrency', type=int, default=50, help='Number of concurrent clients')
+    parser.add_argument('--rate', type=float, default=200, help='Requests per second offered while measuring event-loop lag')
+    parser.add_argument('--blacklist_size', type=int, default=1000, help='Number of blacklisted addresses')
+    args = parser.parse_args()
+
+    for name, metrics in benchmark_middleware(args.n_requests, args.concurrency, args.rate, args.blacklist_size).items():
+        print(name, json.dumps({key: round(value, 3) for key, value in metrics.items()}))
@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import features
+from API import serialization
+from app_api import PropertyData, PredictionResponse
+
+
+def best_time(function, repeats: int) -> float:
+    """Returns the best time in seconds over the given number of calls"""
+    best = np.inf
+    for _ in range(repeats):
+        start = perf_counter()
+        function()
+        best = min(best, perf_counter() - start)
+    return best
+
+def per_record_json(bodies: list, prices: np.ndarray):
+    """Current /predict path, once per row: pydantic validation, one-row DataFrame, standard JSON response"""
+    for body, price in zip(bodies, prices):
+        record = PropertyData.model_validate_json(body).model_dump()
+        features.to_frame([record])
+        JSONResponse(content=jsonable_encoder(PredictionResponse(price=price))).body
+
+def pydantic_batch_json(body: bytes, prices: np.ndarray):
+    """Same validation on a list of records in a single request"""
+    records = TypeAdapter(list[PropertyData]).validate_json(body)
+    features.to_frame([record.model_dump() for record in records])
+    JSONResponse(content={"price": prices.tolist()}).body
+
+def columnar(body: bytes, media_type: str, prices: np.ndarray):
+    """New /predict_batch path: whole-column decoding and orjson, MessagePack or Arrow encoding"""
+    serialization.decode_frame(body, media_type, features.CATEGORICAL_FEATURES, features.NUMERICAL_FEATURES)
+    serialization.encode_columns({"price": prices}, media_type)
+
+def encode_arrow(data: pd.DataFrame) -> bytes:
+    import pyarrow as pa
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def benchmark_serialization(data: pd.DataFrame, sizes: list, repeats: int) -> list:
+    """Measures request decoding plus response encoding per 1000 rows, model scoring excluded"""
+    import msgpack
+    results = []
+    for size in sizes:
+        batch = data.sample(size, replace=size > len(data), random_state=0)[features.SERVING_FEATURES]
+        prices = np.random.default_rng(0).uniform(1000, 50000, size)
+        records = batch.to_dict(orient="records")
+        columns = {col: values.tolist() for col, values in batch.items()}
+        bodies = {
+            "json_per_record": [json.dumps(record).encode() for record in records],
+            "json_pydantic_batch": json.dumps(records).encode(),
+            "json_columnar": serialization.dumps_json(columns),
+            "msgpack_columnar": msgpack.packb(columns),
+            "arrow_ipc": encode_arrow(batch),
+        }
+        paths = {
+            "json_per_record": lambda: per_record_json(bodies["json_per_record"], prices),
+            "json_pydantic_batch": lambda: pydantic_batch_json(bodies["json_pydantic_batch"], prices),
+            "json_columnar": lambda: columnar(bodies["json_columnar"], serialization.JSON, prices),
+            "msgpack_columnar": lambda: columnar(bodies["msgpack_columnar"], serialization.MSGPACK, prices),
+            "arrow_ipc": lambda: columnar(bodies["arrow_ipc"], serialization.ARROW, prices),
+        }
+        for name, path in paths.items():
+            body = bodies[name]
+            results.append({
+                "rows": size,
+                "path": name,
+                "request_kb": (sum(map(len, body)) if isinstance(body, list) else len(body)) / 1024,
+                "ms_per_1k_rows": best_time(path, repeats) / size * 1000 * 1000,
+            })
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare request decoding and response encoding of the JSON and binary formats')
+    parser.add_argument('--data', type=str, default='provided/test.csv', help='CSV file the request rows are drawn from')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 1000, 10000], help='Rows per request')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed runs per measurement, the fastest is kept')
+    args = parser.parse_args()
+
+    results = pd.DataFrame(benchmark_serialization(pd.read_csv(args.data), args.sizes, args.repeats))
+    print(results.round(3).to_string(index=False))
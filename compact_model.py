@@ -0,0 +1,120 @@
+import numpy as np
+from sklearn.dummy import DummyRegressor
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.pipeline import Pipeline
+
+
+class CompactEnsemble:
+    """Gradient boosting ensemble packed into contiguous struct-of-arrays.
+
+    Every node of every tree lives in the same flat arrays (split feature, threshold, leaf value),
+    and children[2 * node] / children[2 * node + 1] hold the left and right child. Leaves point to
+    themselves, so a batch is scored by stepping the node index of all rows through all trees at
+    once, max_depth times, with no Python loop over trees or rows.
+
+    The per-call overhead is a handful of numpy operations, so it is several times faster than
+    scikit-learn for the single rows scored by /predict. For batches beyond a few dozen rows the
+    Cython evaluator in scikit-learn is faster.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth: int, baseline: float):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.baseline = baseline
+
+    @classmethod
+    def from_gradient_boosting(cls, model: GradientBoostingRegressor, dtype=np.float64) -> "CompactEnsemble":
+        """Packs a fitted GradientBoostingRegressor. With dtype=np.float32 thresholds and leaf values are
+        stored in single precision, halving their memory at the cost of a small rounding error in the sum."""
+        if not isinstance(model.init_, DummyRegressor):
+            raise ValueError("Only ensembles initialised with the default DummyRegressor are supported")
+
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_[:, 0]:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            left = np.where(is_leaf, nodes, tree.children_left) + offset
+            right = np.where(is_leaf, nodes, tree.children_right) + offset
+            children.append(np.column_stack((left, right)).ravel())
+            # Leaf values are pre-scaled by the learning rate, so scoring is a plain sum
+            values.append(np.where(is_leaf, tree.value[:, 0, 0] * model.learning_rate, 0.0))
+            roots.append(offset)
+            offset += tree.node_count
+
+        threshold = np.concatenate(thresholds)
+        if dtype == np.float32:
+            # Round thresholds down so that float32 inputs take exactly the same branches
+            rounded = threshold.astype(np.float32)
+            too_high = rounded.astype(np.float64) > threshold
+            rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+            threshold = rounded
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=threshold,
+            children=np.concatenate(children).astype(np.int32),
+            value=np.concatenate(values).astype(dtype),
+            roots=np.array(roots, dtype=np.int32),
+            max_depth=max(estimator.tree_.max_depth for estimator in model.estimators_[:, 0]),
+            baseline=float(model.init_.constant_.ravel()[0]),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the packed arrays"""
+        return sum(array.nbytes for array in (self.feature, self.threshold, self.children, self.value, self.roots))
+
+    def predict(self, X, batch_size: int = 256) -> np.ndarray:
+        # Trees are fitted on float32 inputs, the same cast keeps the branches identical to scikit-learn
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.shape[0] > batch_size:
+            # Keeps the (rows x trees) node index matrix small enough to stay in cache
+            return np.concatenate([self.predict(X[i:i + batch_size], batch_size) for i in range(0, X.shape[0], batch_size)])
+        values = X.ravel()
+        row_offsets = (np.arange(X.shape[0], dtype=np.intp) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.roots.shape[0]))
+        for _ in range(self.max_depth):
+            go_right = values[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+        return self.baseline + self.value[nodes].sum(axis=1, dtype=np.float64)
+
+
+class CompactPipeline:
+    """Runs the preprocessing steps of a trained pipeline followed by a CompactEnsemble"""
+
+    def __init__(self, preprocessing: Pipeline, ensemble: CompactEnsemble):
+        self.preprocessing = preprocessing
+        self.ensemble = ensemble
+
+    @property
+    def named_steps(self):
+        return self.preprocessing.named_steps
+
+    def predict(self, X) -> np.ndarray:
+        return self.ensemble.predict(self.preprocessing.transform(X))
+
+
+def compact_pipeline(pipeline: Pipeline, dtype=np.float64) -> CompactPipeline:
+    """Replaces the final GradientBoostingRegressor of a trained pipeline with its compact form"""
+    model = pipeline.steps[-1][1]
+    if not isinstance(model, GradientBoostingRegressor):
+        raise ValueError("The last step of the pipeline must be a GradientBoostingRegressor")
+    return CompactPipeline(pipeline[:-1], CompactEnsemble.from_gradient_boosting(model, dtype))
+
+def check_parity(pipeline: Pipeline, compact: CompactPipeline, X, rtol: float = 1e-9) -> float:
+    """Compares compact predictions with pipeline.predict, raising if they differ by more than rtol.
+    Returns the largest relative difference."""
+    expected = pipeline.predict(X)
+    actual = compact.predict(X)
+    difference = float(np.max(np.abs(actual - expected) / np.maximum(np.abs(expected), 1.0)))
+    if difference > rtol:
+        raise AssertionError(f"Compact predictions differ from the pipeline by up to {difference:.3g} (relative)")
+    return difference
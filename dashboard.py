@@ -12,6 +12,7 @@ show_sidebar_pages()
 # List of available pages
 pages = {
     "Test Prediction": "test_prediction",
+    "What-If Pricing": "price_sensitivity",
     "Regenerate API Key": "regenerate_api_key",
     "Monitoring Dashboard": "monitoring",
     "Retrain Model ": "retrain_model"
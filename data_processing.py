@@ -8,7 +8,8 @@ def remove_invalid_rows(data: pd.DataFrame) -> pd.DataFrame:
     return data
 
 def feature_engineering(data: pd.DataFrame) -> pd.DataFrame:
-    """Performs feature engineering on the dataset."""
+    """Performs feature engineering on the dataset.
+    Columns derived from the target are listed in features.TRAINING_ONLY_FEATURES and are not used as model inputs."""
     
     # Create derived features
     if 'price' in data.columns and 'net_usable_area' in data.columns:
@@ -0,0 +1,171 @@
+import math
+import threading
+from bisect import bisect_right
+
+import numpy as np
+
+# Features monitored for drift, the rest of the request is ignored
+NUMERICAL_DRIFT_FEATURES = ["net_usable_area", "net_area", "n_rooms", "n_bathroom", "latitude", "longitude"]
+CATEGORICAL_DRIFT_FEATURES = ["type", "sector"]
+
+# Usual population stability index thresholds
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+
+def build_reference_profile(data, n_bins: int = 10) -> dict:
+    """Summarises the training inputs: quantile bin edges and proportions for numerical features,
+    category proportions for categorical features. The profile is small and JSON serialisable."""
+    profile = {"n_rows": int(len(data)), "numerical": {}, "categorical": {}}
+    for col in NUMERICAL_DRIFT_FEATURES:
+        values = data[col].dropna()
+        edges = sorted(set(float(q) for q in values.quantile([i / n_bins for i in range(1, n_bins)])))
+        counts = [0] * (len(edges) + 1)
+        for value in values:
+            counts[bisect_right(edges, value)] += 1
+        profile["numerical"][col] = {"edges": edges, "proportions": [count / max(len(values), 1) for count in counts]}
+    for col in CATEGORICAL_DRIFT_FEATURES:
+        proportions = data[col].value_counts(normalize=True)
+        profile["categorical"][col] = {str(category): float(p) for category, p in proportions.items()}
+    return profile
+
+def population_stability_index(expected: list, actual: list, epsilon: float = 1e-4) -> float:
+    """PSI between two lists of proportions over the same bins"""
+    psi = 0.0
+    for e, a in zip(expected, actual):
+        e, a = max(e, epsilon), max(a, epsilon)
+        psi += (a - e) * math.log(a / e)
+    return psi
+
+def drift_status(psi: float) -> str:
+    if psi >= PSI_SIGNIFICANT:
+        return "significant"
+    if psi >= PSI_MODERATE:
+        return "moderate"
+    return "stable"
+
+
+class CountMinSketch:
+    """Approximate counts in width x depth counters, estimates never undercount"""
+
+    def __init__(self, width: int = 512, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.table = [[0] * width for _ in range(depth)]
+
+    def add(self, item: str, count: int = 1):
+        for row in range(self.depth):
+            self.table[row][hash((row, item)) % self.width] += count
+
+    def estimate(self, item: str) -> int:
+        return min(self.table[row][hash((row, item)) % self.width] for row in range(self.depth))
+
+
+class SpaceSaving:
+    """Tracks the k most frequent items (Space-Saving algorithm) in at most k counters"""
+
+    def __init__(self, k: int = 20):
+        self.k = k
+        self.counts = {}
+
+    def add(self, item: str, count: int = 1):
+        if item in self.counts or len(self.counts) < self.k:
+            self.counts[item] = self.counts.get(item, 0) + count
+            return
+        # Replace the smallest counter, inheriting its count as the error bound
+        smallest = min(self.counts, key=self.counts.get)
+        self.counts[item] = self.counts.pop(smallest) + count
+
+    def top(self) -> list:
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+
+
+class DriftMonitor:
+    """Compares live /predict inputs with the training reference profile in constant memory.
+
+    Numerical features are counted into the reference quantile bins, categorical features into a
+    count-min sketch. Categories missing from the training data (which the TargetEncoder maps to
+    its fallback value) are counted separately and their most frequent values are tracked.
+    Each update is a few bisects and hashes, negligible next to scoring the model.
+    """
+
+    def __init__(self, profile: dict, min_requests: int = 100):
+        self.profile = profile
+        # Below this many observed values a feature is reported as insufficient_data instead of scored
+        self.min_requests = min_requests
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bins = {col: [0] * (len(ref["edges"]) + 1) for col, ref in profile["numerical"].items()}
+        self.missing = {col: 0 for col in profile["numerical"]}
+        self.known = {col: set(ref) for col, ref in profile["categorical"].items()}
+        self.sketches = {col: CountMinSketch() for col in profile["categorical"]}
+        self.unseen = {col: 0 for col in profile["categorical"]}
+        self.unseen_top = {col: SpaceSaving() for col in profile["categorical"]}
+
+    def update(self, record: dict):
+        """Adds one request to the sketches"""
+        with self.lock:
+            self.requests += 1
+            for col, ref in self.profile["numerical"].items():
+                value = record.get(col)
+                if value is None or value != value:
+                    self.missing[col] += 1
+                else:
+                    self.bins[col][bisect_right(ref["edges"], value)] += 1
+            for col in self.profile["categorical"]:
+                value = str(record.get(col))
+                self.sketches[col].add(value)
+                if value not in self.known[col]:
+                    self.unseen[col] += 1
+                    self.unseen_top[col].add(value)
+
+    def update_batch(self, data):
+        """Adds a DataFrame of requests, binning numerical columns with numpy and counting each distinct category once"""
+        with self.lock:
+            self.requests += len(data)
+            for col, ref in self.profile["numerical"].items():
+                values = data[col].to_numpy(dtype=float)
+                missing = np.isnan(values)
+                self.missing[col] += int(missing.sum())
+                counts = np.bincount(np.searchsorted(ref["edges"], values[~missing], side="right"), minlength=len(self.bins[col]))
+                self.bins[col] = [total + int(count) for total, count in zip(self.bins[col], counts)]
+            for col in self.profile["categorical"]:
+                for value, count in data[col].astype(str).value_counts().items():
+                    self.sketches[col].add(value, int(count))
+                    if value not in self.known[col]:
+                        self.unseen[col] += int(count)
+                        self.unseen_top[col].add(value, int(count))
+
+    def summary(self) -> dict:
+        """Returns the drift score of every monitored feature, once it has at least min_requests values"""
+        with self.lock:
+            features = {}
+            for col, ref in self.profile["numerical"].items():
+                total = sum(self.bins[col])
+                if total >= self.min_requests:
+                    psi = population_stability_index(ref["proportions"], [count / total for count in self.bins[col]])
+                    features[col] = {"psi": psi, "status": drift_status(psi)}
+                else:
+                    features[col] = {"psi": None, "status": "insufficient_data"}
+                features[col]["missing"] = self.missing[col]
+            for col, ref in self.profile["categorical"].items():
+                categories = list(ref)
+                total = self.requests
+                if total >= self.min_requests:
+                    expected = [ref[category] for category in categories] + [0.0]
+                    actual = [min(self.sketches[col].estimate(category), total) / total for category in categories]
+                    actual.append(self.unseen[col] / total)
+                    psi = population_stability_index(expected, actual)
+                    features[col] = {"psi": psi, "status": drift_status(psi)}
+                else:
+                    features[col] = {"psi": None, "status": "insufficient_data"}
+                features[col].update({
+                    "unseen_rate": self.unseen[col] / total if total else 0.0,
+                    "top_unseen": self.unseen_top[col].top(),
+                })
+            return {
+                "requests": self.requests,
+                "min_requests": self.min_requests,
+                "reference_rows": self.profile["n_rows"],
+                "features": features
+            }
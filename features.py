@@ -0,0 +1,203 @@
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.neighbors import BallTree
+
+# Single source of truth for the feature set shared by train_model.py and app_api.py
+TARGET = "price"
+CATEGORICAL_FEATURES = ["type", "sector"]
+NUMERICAL_FEATURES = ["net_usable_area", "net_area", "n_rooms", "n_bathroom", "latitude", "longitude"]
+
+# Features available in a /predict request, in the order the model expects them
+SERVING_FEATURES = CATEGORICAL_FEATURES + NUMERICAL_FEATURES
+
+# Features derived from the target. They only exist on labelled data, so they must never reach the model
+TRAINING_ONLY_FEATURES = ["price_per_sq_meter"]
+
+
+def to_frame(records: list) -> pd.DataFrame:
+    """Builds a model input DataFrame with the serving features, in order, from a list of dicts"""
+    return pd.DataFrame.from_records(records, columns=SERVING_FEATURES)
+
+
+def sensitivity_grid(base: dict, ranges: dict) -> pd.DataFrame:
+    """Builds every combination of the given feature values on top of a base property, column-wise.
+    Rows are in C order (the last feature varies fastest), so predictions reshape to the grid shape."""
+    mesh = np.meshgrid(*[np.asarray(values, dtype=float) for values in ranges.values()], indexing="ij")
+    n_rows = mesh[0].size
+    grid = pd.DataFrame({col: [base[col]] * n_rows for col in SERVING_FEATURES})
+    for col, values in zip(ranges, mesh):
+        grid[col] = values.ravel()
+    return grid
+
+
+def get_derived_features(model) -> list:
+    """Returns the names of the lookup features computed inside a trained pipeline"""
+    steps = getattr(model, "named_steps", {})
+    return [name for step in steps.values() for name in getattr(step, "derived_features", [])]
+
+
+class SectorPriceLookup(BaseEstimator, TransformerMixin):
+    """Adds per-sector price statistics learned from the training data.
+
+    The statistics are kept in a plain dict keyed by sector, so they are pickled together
+    with the pipeline and every lookup at prediction time is a single hash lookup.
+    Sectors not seen during training fall back to the global statistics.
+    When transforming the training data itself, each listing is left out of its sector's statistics.
+    """
+
+    derived_features = ["sector_median_price", "sector_median_price_per_sq_meter", "sector_listing_count"]
+
+    def fit(self, X: pd.DataFrame, y):
+        data = pd.DataFrame({
+            "sector": X["sector"].to_numpy(),
+            "price": np.asarray(y, dtype=float),
+            "net_usable_area": X["net_usable_area"].to_numpy(dtype=float),
+        })
+        data = data[data["net_usable_area"] > 0]
+        data["price_per_sq_meter"] = data["price"] / data["net_usable_area"]
+
+        grouped = data.groupby("sector").agg(
+            median_price=("price", "median"),
+            median_price_per_sq_meter=("price_per_sq_meter", "median"),
+            listing_count=("price", "size"),
+        )
+        self.table_ = {
+            row.Index: (float(row.median_price), float(row.median_price_per_sq_meter), float(row.listing_count))
+            for row in grouped.itertuples()
+        }
+        self.default_ = (float(data["price"].median()), float(data["price_per_sq_meter"].median()), 0.0)
+        return self
+
+    def lookup(self, sector: str) -> dict:
+        """Returns the statistics for a single sector"""
+        return dict(zip(self.derived_features, self.table_.get(sector, self.default_)))
+
+    def _stats(self, sectors) -> np.ndarray:
+        stats = np.array([self.table_.get(sector, self.default_) for sector in sectors], dtype=float)
+        return stats.reshape(len(sectors), len(self.derived_features))
+
+    def transform(self, X: pd.DataFrame) -> pd.DataFrame:
+        stats = self._stats(X["sector"])
+        return X.assign(**dict(zip(self.derived_features, stats.T)))
+
+    def fit_transform(self, X: pd.DataFrame, y=None, **fit_params) -> pd.DataFrame:
+        """Fits the table on all rows, but describes each training row with the statistics of its sector
+        without that row (leave-one-out), so its own price never reaches its features.
+        Rows alone in their sector get the global statistics, like unseen sectors at serving time."""
+        self.fit(X, y)
+        stats = self._stats(X["sector"])
+
+        price = np.asarray(y, dtype=float)
+        area = X["net_usable_area"].to_numpy(dtype=float)
+        codes, _ = pd.factorize(X["sector"].to_numpy())
+        # Other rows were left out of the table by fit(), their own price is not in their statistics
+        rows = np.flatnonzero((area > 0) & (codes >= 0))
+        codes, price, area = codes[rows], price[rows], area[rows]
+        others = np.bincount(codes)[codes] - 1
+
+        loo = np.column_stack((
+            self._leave_one_out_median(codes, price),
+            self._leave_one_out_median(codes, price / area),
+            others.astype(float),
+        ))
+        alone = others == 0
+        loo[alone] = self.default_
+        stats[rows] = loo
+        return X.assign(**dict(zip(self.derived_features, stats.T)))
+
+    @staticmethod
+    def _leave_one_out_median(codes: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Median of each row's group without the row itself, computed for all rows from one sort.
+        Rows alone in their group get NaN."""
+        order = np.lexsort((values, codes))
+        sorted_codes, sorted_values = codes[order], values[order]
+        starts = np.searchsorted(sorted_codes, sorted_codes, side="left")
+        rank = np.arange(len(order)) - starts
+        remaining = np.searchsorted(sorted_codes, sorted_codes, side="right") - starts - 1
+
+        def nth_remaining(n):
+            # n-th smallest value of the group once the row itself is skipped
+            n = np.clip(n, 0, np.maximum(remaining - 1, 0))
+            return sorted_values[np.minimum(starts + n + (n >= rank), len(order) - 1)]
+
+        medians = (nth_remaining((remaining - 1) // 2) + nth_remaining(remaining // 2)) / 2
+        result = np.empty(len(order))
+        result[order] = np.where(remaining > 0, medians, np.nan)
+        return result
+
+
+class GeoNeighborFeatures(BaseEstimator, TransformerMixin):
+    """Adds features describing the nearest comparable training listings.
+
+    A haversine BallTree over the training coordinates is built at fit time and pickled
+    with the pipeline. At prediction time a whole batch is queried in one call.
+    When transforming the training data itself, each listing is excluded from its own neighbours,
+    otherwise its price would leak into its features.
+    """
+
+    derived_features = ["geo_median_price_per_sq_meter", "geo_kth_neighbor_distance_km"]
+    EARTH_RADIUS_KM = 6371.0
+
+    def __init__(self, n_neighbors: int = 10, leaf_size: int = 40):
+        self.n_neighbors = n_neighbors
+        self.leaf_size = leaf_size
+
+    @staticmethod
+    def _coordinates(latitude, longitude) -> np.ndarray:
+        return np.radians(np.column_stack((np.asarray(latitude, dtype=float), np.asarray(longitude, dtype=float))))
+
+    def fit(self, X: pd.DataFrame, y):
+        coords = self._coordinates(X["latitude"], X["longitude"])
+        price = np.asarray(y, dtype=float)
+        area = X["net_usable_area"].to_numpy(dtype=float)
+        valid = np.isfinite(coords).all(axis=1) & (area > 0)
+
+        self.tree_ = BallTree(coords[valid], leaf_size=self.leaf_size, metric="haversine")
+        self.price_per_sq_meter_ = price[valid] / area[valid]
+        self.k_ = min(self.n_neighbors, int(valid.sum()))
+
+        # Listings without coordinates get the typical values of the training set, estimated on a sample
+        step = max(1, int(valid.sum()) // 1000)
+        kth_distance = self._query(coords[valid][::step], self_index=np.arange(int(valid.sum()))[::step])[:, 1]
+        self.default_ = (float(np.median(self.price_per_sq_meter_)), float(np.median(kth_distance)))
+        return self
+
+    def _query(self, coords: np.ndarray, self_index: np.ndarray = None) -> np.ndarray:
+        if self_index is None:
+            distances, indices = self.tree_.query(coords, k=self.k_)
+        else:
+            # One extra neighbour is fetched and the row itself is removed by index. With listings sharing
+            # coordinates the row is not necessarily returned first among the zero-distance ties.
+            k = min(self.k_ + 1, self.tree_.data.shape[0])
+            distances, indices = self.tree_.query(coords, k=k)
+            keep = indices != np.asarray(self_index)[:, None]
+            # Rows not found in their own result (or not in the tree) drop their farthest neighbour instead
+            keep[keep.all(axis=1), -1] = False
+            distances = distances[keep].reshape(len(coords), k - 1)
+            indices = indices[keep].reshape(len(coords), k - 1)
+        median_price = np.median(self.price_per_sq_meter_[indices], axis=1)
+        return np.column_stack((median_price, distances[:, -1] * self.EARTH_RADIUS_KM))
+
+    def neighbor_features(self, latitude, longitude, self_index: np.ndarray = None) -> np.ndarray:
+        """Returns an (n, 2) array with the derived features for arrays of coordinates.
+        self_index gives the position in the tree of each row to exclude from its own neighbours, -1 for none."""
+        coords = self._coordinates(latitude, longitude)
+        valid = np.isfinite(coords).all(axis=1)
+        values = np.tile(np.array(self.default_, dtype=float), (len(coords), 1))
+        if valid.any():
+            values[valid] = self._query(coords[valid], None if self_index is None else np.asarray(self_index)[valid])
+        return values
+
+    def transform(self, X: pd.DataFrame) -> pd.DataFrame:
+        values = self.neighbor_features(X["latitude"], X["longitude"])
+        return X.assign(**dict(zip(self.derived_features, values.T)))
+
+    def fit_transform(self, X: pd.DataFrame, y=None, **fit_params) -> pd.DataFrame:
+        self.fit(X, y)
+        # Same selection as fit(): the rows stored in the tree, in order
+        in_tree = np.isfinite(self._coordinates(X["latitude"], X["longitude"])).all(axis=1) & (X["net_usable_area"].to_numpy(dtype=float) > 0)
+        self_index = np.full(len(X), -1)
+        self_index[in_tree] = np.arange(int(in_tree.sum()))
+        values = self.neighbor_features(X["latitude"], X["longitude"], self_index=self_index)
+        return X.assign(**dict(zip(self.derived_features, values.T)))
@@ -2,13 +2,14 @@ import streamlit as st
 import json
 from datetime import datetime
 import plotly.graph_objects as go
+import pandas as pd
 
 
 import sys
 import os
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
-from streamlit_utils import show_sidebar_pages
+from streamlit_utils import show_sidebar_pages, get_api_session, API_URL
 show_sidebar_pages()
 
 
@@ -149,13 +150,176 @@ def display_model_quality_tab(model_metrics):
 
 
 
+# Load shadow model statistics from the running API
+def load_shadow_stats():
+    try:
+        response = get_api_session().get(f"{API_URL}/shadow_stats", timeout=5)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        st.warning(f"Could not fetch shadow statistics from the API: {e}")
+        return None
+
+# Display Shadow Models tab
+def display_shadow_models_tab():
+    st.subheader("Shadow Models")
+    shadow_stats = load_shadow_stats()
+    if not shadow_stats:
+        return
+    if not shadow_stats["candidates"]:
+        st.info("No shadow candidates registered. Register one from the Retrain Model page or with the SHADOW_MODELS environment variable.")
+        return
+
+    st.write(f"**Mirrored traffic:** {shadow_stats['fraction']:.0%} of /predict requests")
+    st.metric("Dropped (executor busy)", shadow_stats["dropped"], help="Mirrored requests skipped because shadow scoring fell behind")
+
+    rows = []
+    for candidate, stats in shadow_stats["candidates"].items():
+        rows.append({
+            "Candidate": candidate,
+            "Requests": stats["requests"],
+            "Errors": stats["errors"],
+            "Mean Abs Diff": stats["mean_abs_diff"],
+            "Mean Abs % Diff": stats["mean_abs_pct_diff"],
+            "Max Abs Diff": stats["max_abs_diff"],
+            "Served p50 (ms)": stats["primary_latency_ms"]["p50"],
+            "Candidate p50 (ms)": stats["candidate_latency_ms"]["p50"],
+            "Served p95 (ms)": stats["primary_latency_ms"]["p95"],
+            "Candidate p95 (ms)": stats["candidate_latency_ms"]["p95"],
+        })
+    st.dataframe(pd.DataFrame(rows), hide_index=True)
+
+    for candidate, stats in shadow_stats["candidates"].items():
+        with st.expander(f"{candidate}: served vs candidate predictions"):
+            if not stats["recent"]:
+                st.write("No mirrored requests yet.")
+                continue
+            served, predicted = zip(*stats["recent"])
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(x=served, y=predicted, mode="markers", marker=dict(size=6, color='royalblue')))
+            fig.add_trace(go.Scatter(x=[min(served), max(served)], y=[min(served), max(served)], mode="lines", line=dict(dash="dash", color="gray")))
+            fig.update_layout(
+                xaxis_title="Served model price",
+                yaxis_title="Candidate price",
+                template="seaborn",
+                showlegend=False,
+                margin=dict(l=40, r=40, t=40, b=40)
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+# Load input drift scores from the running API
+def load_drift():
+    try:
+        response = get_api_session().get(f"{API_URL}/drift", timeout=5)
+        if response.status_code == 404:
+            st.info(response.json()["detail"])
+            return None
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        st.warning(f"Could not fetch drift scores from the API: {e}")
+        return None
+
+# Display Input Drift tab
+def display_drift_tab():
+    st.subheader("Input Drift")
+    drift = load_drift()
+    if not drift:
+        return
+
+    st.write(f"**Requests monitored:** {drift['requests']} (reference: {drift['reference_rows']} training rows)")
+    st.caption("Population Stability Index (PSI) of live /predict inputs against the training data: below 0.1 is stable, 0.1 to 0.25 moderate drift, above 0.25 significant drift.")
+
+    if drift["requests"] < drift["min_requests"]:
+        st.info(f"Drift is scored once {drift['min_requests']} requests have been monitored, {drift['requests']} so far.")
+
+    rows = [
+        {
+            "Feature": feature,
+            "PSI": None if scores["psi"] is None else round(scores["psi"], 4),
+            "Status": "not enough data yet" if scores["status"] == "insufficient_data" else scores["status"]
+        }
+        for feature, scores in drift["features"].items()
+    ]
+    st.dataframe(pd.DataFrame(rows), hide_index=True)
+
+    for feature in ["type", "sector"]:
+        scores = drift["features"].get(feature)
+        if scores and scores["unseen_rate"] > 0:
+            st.metric(f"Unseen {feature} rate", f"{scores['unseen_rate']:.1%}", help="Share of requests with a value missing from the training data, scored with the TargetEncoder fallback")
+            with st.expander(f"Most frequent unseen {feature} values"):
+                st.dataframe(pd.DataFrame(scores["top_unseen"], columns=[feature, "Requests"]), hide_index=True)
+
+# Load the leaderboard written by backtest.py
+def load_leaderboard():
+    try:
+        with open("models/backtest_leaderboard.json", "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+# Display Backtest tab
+def display_backtest_tab():
+    st.subheader("Backtest Leaderboard")
+    leaderboard = load_leaderboard()
+    if not leaderboard:
+        st.info("No leaderboard found. Run `python backtest.py --data_source csv --test provided/test.csv` to score every stored model.")
+        return
+
+    evaluated_on = datetime.fromisoformat(leaderboard["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+    dataset = leaderboard["dataset"]
+    st.write(f"**Evaluated on:** {evaluated_on}, {dataset['rows']} rows from {dataset['source']} (fingerprint {dataset['fingerprint']})")
+    st.caption("Every version is scored on the same evaluation set. Versions whose estimator consumes a target-derived column are ranked last, their errors are not comparable. Columns a pipeline receives but drops do not count.")
+
+    rows = []
+    for result in leaderboard["models"]:
+        if result["status"] != "ok":
+            continue
+        rows.append({
+            "Rank": result["rank"],
+            "Model": result["model"],
+            "RMSE": round(result["RMSE"], 2),
+            "MAPE": round(result["MAPE"], 4),
+            "MAE": round(result["MAE"], 2),
+            "Latency (ms / 1k rows)": round(result["latency_ms_per_1k_rows"], 2),
+            "Load Time (s)": round(result["load_seconds"], 3),
+            "Size (KB)": round(result["size_bytes"] / 1024, 1),
+            "Target Leakage": ", ".join(result["target_leakage"]),
+        })
+    leaderboard_df = pd.DataFrame(rows)
+    st.dataframe(leaderboard_df, hide_index=True)
+
+    if not leaderboard_df.empty:
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=leaderboard_df["Latency (ms / 1k rows)"],
+            y=leaderboard_df["RMSE"],
+            mode="markers",
+            text=leaderboard_df["Model"],
+            marker=dict(size=8, color=['firebrick' if leak else 'royalblue' for leak in leaderboard_df["Target Leakage"]])
+        ))
+        fig.update_layout(
+            title="Error vs Latency",
+            xaxis_title="Latency (ms / 1k rows)",
+            yaxis_title="RMSE",
+            template="seaborn",
+            showlegend=False,
+            margin=dict(l=40, r=40, t=40, b=40)
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+    failed = [result for result in leaderboard["models"] if result["status"] != "ok"]
+    if failed:
+        with st.expander(f"{len(failed)} models could not be scored"):
+            st.dataframe(pd.DataFrame(failed)[["model", "error"]], hide_index=True)
+
 # Main function to render the page
 def main():
     st.title("Monitoring Dashboard")
     api_logs, model_metrics = load_logs_and_metrics()
 
     # Tabs for API logs and model quality
-    tab1, tab2 = st.tabs(["API Logs", "Model Quality"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["API Logs", "Model Quality", "Shadow Models", "Input Drift", "Backtest"])
 
     with tab1:
         display_api_logs_tab(api_logs)
@@ -163,5 +327,14 @@ def main():
     with tab2:
         display_model_quality_tab(model_metrics)
 
+    with tab3:
+        display_shadow_models_tab()
+
+    with tab4:
+        display_drift_tab()
+
+    with tab5:
+        display_backtest_tab()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,117 @@
+import streamlit as st
+import plotly.graph_objects as go
+import toml
+
+import os
+import sys
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+from streamlit_utils import show_sidebar_pages, get_api_session, API_URL
+show_sidebar_pages()
+
+# Features that can be varied, with their default range and number of steps
+RANGE_DEFAULTS = {
+    "net_usable_area": (50.0, 300.0, 26),
+    "net_area": (50.0, 400.0, 36),
+    "n_rooms": (1.0, 6.0, 6),
+    "n_bathroom": (1.0, 5.0, 5),
+    "latitude": (-33.50, -33.35, 16),
+    "longitude": (-70.65, -70.50, 16),
+}
+
+# Function to load the API key from secrets.toml
+def load_api_key():
+    try:
+        secrets = toml.load("API/secrets.toml")
+        return secrets.get("property_friends", "API_KEY_NOT_FOUND")
+    except Exception as e:
+        st.error(f"Error loading API key: {e}")
+        return None
+
+# Responses are cached per payload, so reruns and revisited settings do not call the API again.
+# Errors are raised instead of returned, Streamlit does not cache them.
+@st.cache_data(ttl=600, show_spinner="Scoring the price grid...")
+def get_sensitivity(api_key, payload):
+    response = get_api_session().post(
+        f"{API_URL}/sensitivity",
+        headers={"Authorization": api_key},
+        json=payload,
+        timeout=30
+    )
+    if response.status_code == 429:
+        raise RuntimeError("Rate limit exceeded. Please try again later.")
+    if response.status_code != 200:
+        raise RuntimeError(f"API Error: {response.status_code} {response.text}")
+    return response.json()
+
+def range_inputs(label, exclude=None):
+    """Renders the controls of one feature range and returns it as a request dict"""
+    options = [feature for feature in RANGE_DEFAULTS if feature != exclude]
+    feature = st.selectbox(f"{label} feature", options, key=f"{label}_feature")
+    start, stop, steps = RANGE_DEFAULTS[feature]
+    col1, col2, col3 = st.columns(3)
+    return {
+        "feature": feature,
+        "start": col1.number_input("From", value=start, key=f"{label}_{feature}_start", format="%.5g"),
+        "stop": col2.number_input("To", value=stop, key=f"{label}_{feature}_stop", format="%.5g"),
+        "steps": col3.number_input("Steps", value=steps, min_value=2, max_value=50, step=1, key=f"{label}_{feature}_steps"),
+    }
+
+def plot_sensitivity(result):
+    fig = go.Figure()
+    if len(result["features"]) == 1:
+        fig.add_trace(go.Scatter(x=result["axes"][0], y=result["prices"], mode="lines+markers", line=dict(color='royalblue')))
+        fig.update_layout(xaxis_title=result["features"][0], yaxis_title="Predicted price")
+    else:
+        # prices[i][j] is indexed by the first then the second feature, the heatmap expects rows along y
+        fig.add_trace(go.Heatmap(
+            x=result["axes"][0],
+            y=result["axes"][1],
+            z=[list(row) for row in zip(*result["prices"])],
+            colorscale="Viridis",
+            colorbar=dict(title="Price")
+        ))
+        fig.update_layout(xaxis_title=result["features"][0], yaxis_title=result["features"][1])
+    fig.update_layout(template="seaborn", margin=dict(l=40, r=40, t=40, b=40))
+    st.plotly_chart(fig, use_container_width=True)
+
+# Streamlit Page for What-If Pricing
+def price_sensitivity_page():
+    st.title("What-If Pricing")
+    st.write("See how the predicted price of a property changes when one or two of its features vary. The whole grid is priced in a single API call.")
+
+    api_key = load_api_key()
+    if api_key == "API_KEY_NOT_FOUND":
+        st.warning("API key not found in secrets.toml.")
+        return
+
+    st.header("Base Property")
+    col1, col2 = st.columns(2)
+    base = {
+        "type": col1.selectbox("Property Type", ["departamento", "casa"]),
+        "sector": col2.text_input("Sector", value="vitacura"),
+        "net_usable_area": col1.number_input("Net Usable Area", value=140.0, step=1.0),
+        "net_area": col2.number_input("Net Area", value=170.0, step=1.0),
+        "n_rooms": col1.number_input("Number of Rooms", value=4.0, step=1.0),
+        "n_bathroom": col2.number_input("Number of Bathrooms", value=4.0, step=1.0),
+        "latitude": col1.number_input("Latitude", value=-33.40123, step=0.00001, format="%.5f"),
+        "longitude": col2.number_input("Longitude", value=-70.58056, step=0.00001, format="%.5f"),
+    }
+
+    st.header("Ranges")
+    ranges = [range_inputs("First")]
+    if st.checkbox("Vary a second feature"):
+        ranges.append(range_inputs("Second", exclude=ranges[0]["feature"]))
+
+    if st.button("Price Grid"):
+        try:
+            result = get_sensitivity(api_key, {"base": base, "ranges": ranges})
+        except Exception as e:
+            st.error(str(e))
+            return
+        st.metric("Base property price", f"{result['base_price']:,.0f}")
+        plot_sensitivity(result)
+
+# Run the What-If Pricing Page
+if __name__ == "__main__":
+    price_sensitivity_page()
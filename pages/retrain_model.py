@@ -1,16 +1,34 @@
 import streamlit as st
+import toml
 import sys
 import os
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
-from streamlit_utils import show_sidebar_pages
+from streamlit_utils import show_sidebar_pages, get_api_session, API_URL
 show_sidebar_pages()
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from train_model import train_and_evaluate, get_next_versioned_filename, save_model, save_metrics
 
+def register_shadow_candidate(model_file: str):
+    """Asks the running API to mirror live traffic to the given model version"""
+    try:
+        api_key = toml.load("API/secrets.toml").get("property_friends")
+        response = get_api_session().post(
+            f"{API_URL}/shadow_models",
+            headers={"Authorization": api_key},
+            json={"model_file": model_file},
+            timeout=30
+        )
+        if response.status_code == 200:
+            st.success(f"{model_file} registered as shadow candidate")
+        else:
+            st.error(f"Could not register shadow candidate: {response.status_code} {response.text}")
+    except Exception as e:
+        st.error(f"Could not reach the API: {e}")
+
 def main():
     st.title("Model Training and Evaluation")
     data_source = st.selectbox("Choose data source", ["CSV Files", "Postgres Database"], help="Choose the source of the training and test data")
@@ -44,6 +62,7 @@ def main():
             data_source="db"
 
     format = st.selectbox("Choose model format", ["joblib", "pickle"], help="does not affect the demo, but can be useful if model is exported for use in other applications")
+    register_shadow = st.checkbox("Register the new model as shadow candidate", help="The running API scores a fraction of live /predict traffic with the new model, without returning its predictions. Results are shown in the Monitoring Dashboard.")
 
     if st.button("Train and Evaluate"):
         try:
@@ -63,6 +82,10 @@ def main():
             st.write(f"{filename}.{format}")
             st.write("Evaluation Metrics:")
             st.write(metrics)
+
+            if register_shadow:
+                ext = 'pkl' if format == "pickle" else 'joblib'
+                register_shadow_candidate(f"{os.path.basename(filename)}.{ext}")
         except Exception as e:
             st.error(str(e))
 
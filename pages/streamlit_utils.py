@@ -1,4 +1,15 @@
 import streamlit as st
+import requests
+from requests.adapters import HTTPAdapter
+
+API_URL = "http://127.0.0.1:8000"
+
+@st.cache_resource
+def get_api_session():
+    """HTTP session shared by all pages and reruns, so requests to the API reuse keep-alive connections"""
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=10))
+    return session
 
 def show_sidebar_pages():
     
@@ -10,6 +21,7 @@ def show_sidebar_pages():
     # List of available pages
     pages = {
         "Test Prediction": "test_prediction",
+        "What-If Pricing": "price_sensitivity",
         "Regenerate API Key": "regenerate_api_key",
         "Monitoring Dashboard": "monitoring",
         "Retrain Model ": "retrain_model"
@@ -1,5 +1,4 @@
 import streamlit as st
-import requests
 import pandas as pd
 import matplotlib.pyplot as plt
 import toml
@@ -8,7 +7,7 @@ import os
 import sys
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
-from streamlit_utils import show_sidebar_pages
+from streamlit_utils import show_sidebar_pages, get_api_session, API_URL
 show_sidebar_pages()
 
 # Function to load the API key from secrets.toml
@@ -21,13 +20,13 @@ def load_api_key():
         return None
 
 def get_prediction(api_key, data):
-    url = "http://127.0.0.1:8000/predict"
+    url = f"{API_URL}/predict"
     headers = {
         "Content-Type": "application/json",
         "Authorization": api_key,
     }
     try:
-        response = requests.post(url, headers=headers, json=data)
+        response = get_api_session().post(url, headers=headers, json=data)
         if response.status_code == 200:
             return response.json()
         elif response.status_code == 429:
@@ -14,6 +14,8 @@ import os
 import json
 from datetime import datetime
 import data_processing
+import features
+import drift
 
 def load_data_from_csv(train_path: str, test_path: str) -> (pd.DataFrame, pd.DataFrame):
     """Loads the train and test data into pandas DataFrames from CSV files"""
@@ -55,15 +57,26 @@ def load_data_from_db_best_practice(db_url: str, table_name: str, test_size: flo
     return train, test
 
 
-def create_pipeline(categorical_cols: list, model_params: dict) -> Pipeline:
-    """Creates and returns a preprocessing and modeling pipeline"""
+def create_pipeline(categorical_cols: list, model_params: dict, numerical_cols: list = None) -> Pipeline:
+    """Creates and returns a preprocessing and modeling pipeline.
+    The lookup steps are fitted on the training target and shipped inside the pipeline,
+    so the same feature values are computed at training and at serving time."""
+    lookup_steps = [
+        ('sector_lookup', features.SectorPriceLookup()),
+        ('geo_neighbors', features.GeoNeighborFeatures())
+    ]
+    if numerical_cols is None:
+        numerical_cols = features.NUMERICAL_FEATURES + [
+            name for _, step in lookup_steps for name in step.derived_features
+        ]
     categorical_transformer = TargetEncoder()
     preprocessor = ColumnTransformer(
         transformers=[
-            ('categorical', categorical_transformer, categorical_cols)
+            ('categorical', categorical_transformer, categorical_cols),
+            ('numerical', 'passthrough', numerical_cols)
         ]
     )
-    steps = [
+    steps = lookup_steps + [
         ('preprocessor', preprocessor),
         ('model', GradientBoostingRegressor(**model_params))
     ]
@@ -109,9 +122,10 @@ def train_and_evaluate(data_source: str, train_path: str = None, test_path: str
     else:
         raise ValueError("Invalid data source. Choose either 'csv' or 'db'.")
 
-    train_cols = [col for col in train.columns if col not in ['id', 'price']]
-    target = "price"
-    categorical_cols = ["type", "sector"]
+    # Only serving-safe features are used, target-derived columns such as price_per_sq_meter are left out
+    train_cols = features.SERVING_FEATURES
+    target = features.TARGET
+    categorical_cols = features.CATEGORICAL_FEATURES
 
     model_params = {
         "learning_rate": 0.01,
@@ -123,6 +137,8 @@ def train_and_evaluate(data_source: str, train_path: str = None, test_path: str
     
     pipeline = create_pipeline(categorical_cols, model_params)
     pipeline.fit(train[train_cols], train[target])
+    # Shipped with the model so the API can compare live inputs against the training distribution
+    pipeline.reference_profile_ = drift.build_reference_profile(train[train_cols])
 
     test_predictions = pipeline.predict(test[train_cols])
     test_target = test[target].values
@@ -142,6 +158,17 @@ def save_model(model, filename: str, format: str = 'joblib'):
     else:
         raise ValueError("Invalid format. Supported formats are 'joblib' and 'pickle'.")
 
+def load_model(model_path: str):
+    """Loads a model saved with joblib or pickle"""
+    if model_path.endswith('.joblib'):
+        with open(model_path, "rb") as f:
+            return joblib.load(f)
+    elif model_path.endswith('.pkl'):
+        with open(model_path, "rb") as f:
+            return pickle.load(f)
+    else:
+        raise ValueError("Unsupported model file format")
+
 def save_metrics(metrics, filename: str, ext):
     """Saves the metrics to a JSON file"""
     metrics_filename = "models/model_metrics.json"